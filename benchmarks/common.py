@@ -0,0 +1,28 @@
+import contextlib
+import os
+import sys
+import time
+import pathlib
+
+# Run against the source tree without installing the package
+SRC_DIR = pathlib.Path(__file__).parent.parent.absolute() / 'src'
+if str(SRC_DIR) not in sys.path:
+    sys.path.insert(0, str(SRC_DIR))
+
+
+@contextlib.contextmanager
+def quiet():
+    """ Drop anything the engine prints while timing """
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def rate(fn, min_seconds):
+    """ Calls fn until min_seconds have passed. fn returns how many units it processed. Returns units per second. """
+    units = 0
+    start = time.perf_counter()
+    while True:
+        units += fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            return units / elapsed
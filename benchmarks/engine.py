@@ -0,0 +1,38 @@
+import random
+import numpy as np
+from benchmarks.common import quiet, rate
+from pokerrl_env.config import Config
+from pokerrl_env.datatypes import GameTypes
+from pokerrl_env.transition import init_state, step_state
+
+
+def play_hand(config, rng):
+    """ One hand of random legal actions. Returns the number of steps """
+    global_states, done, _, action_mask = init_state(config)
+    steps = 0
+    while not done and action_mask.any():
+        global_states, done, _, action_mask = step_state(global_states, int(rng.choice(np.flatnonzero(action_mask))), config)
+        steps += 1
+    return steps
+
+
+def run(min_seconds):
+    """ hands and steps per second of init_state + step_state at 2-6 players, and for Holdem heads up and 6 handed """
+    results = {}
+    for num_players, game_type, prefix in [*((n, GameTypes.OMAHA_HI, 'engine') for n in range(2, 7)),
+                                           (2, GameTypes.HOLDEM, 'engine.holdem'), (6, GameTypes.HOLDEM, 'engine.holdem')]:
+        config = Config(game_type=game_type, num_players=num_players)
+        random.seed(num_players)
+        rng = np.random.default_rng(num_players)
+        counts = {'hands': 0, 'steps': 0}
+
+        def hand():
+            counts['hands'] += 1
+            counts['steps'] += play_hand(config, rng)
+            return 1
+
+        with quiet():
+            hands_per_sec = rate(hand, min_seconds)
+        results[f'{prefix}.{num_players}p.hands_per_sec'] = hands_per_sec
+        results[f'{prefix}.{num_players}p.steps_per_sec'] = hands_per_sec * counts['steps'] / counts['hands']
+    return results
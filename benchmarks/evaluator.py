@@ -0,0 +1,42 @@
+import numpy as np
+from benchmarks.common import rate
+from pokerrl_env import cardlib
+
+
+def random_deals(num_deals, num_cards, seed=0):
+    rng = np.random.default_rng(seed)
+    deck = cardlib.ENCODING_TABLE[1:, 1:].reshape(-1)
+    return deck[np.argsort(rng.random((num_deals, 52)), axis=1)[:, :num_cards]]
+
+
+def available_backends():
+    try:
+        cardlib.load_library()
+    except OSError:
+        return ['numpy']
+    return ['rust', 'numpy']
+
+
+def run(min_seconds, batch_size=10_000):
+    """ ranks per second of hand_rank one hand at a time and of hand_rank_batch / holdem_hand_rank_batch, per backend """
+    deals = random_deals(batch_size, 9)
+    hands, boards = deals[:, :4], deals[:, 4:]
+    scalar_hands, scalar_board = [list(hand) for hand in hands[:1000]], list(boards[0])
+    previous = cardlib._backend
+    results = {}
+    try:
+        for backend in available_backends():
+            cardlib.set_backend(backend)
+            index = {'hand': 0}
+
+            def one():
+                cardlib.hand_rank(scalar_hands[index['hand'] % len(scalar_hands)], scalar_board)
+                index['hand'] += 1
+                return 1
+
+            results[f'evaluator.{backend}.hand_rank.ranks_per_sec'] = rate(one, min_seconds)
+            results[f'evaluator.{backend}.hand_rank_batch.ranks_per_sec'] = rate(lambda: cardlib.hand_rank_batch(hands, boards).size, min_seconds)
+            results[f'evaluator.{backend}.holdem_hand_rank_batch.ranks_per_sec'] = rate(lambda: cardlib.holdem_hand_rank_batch(hands[:, :2], boards).size, min_seconds)
+    finally:
+        cardlib.set_backend(previous)
+    return results
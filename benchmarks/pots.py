@@ -0,0 +1,15 @@
+from benchmarks.common import rate
+from pokerrl_env.datatypes import Player
+from pokerrl_env.transition import get_pots
+
+
+def run(min_seconds):
+    """ get_pots calls per second with 6 players all in for different amounts, which makes a main pot and 5 side pots """
+    investments = {position: 10 * position for position in range(1, 7)}
+
+    def call():
+        players = [Player(position=position, stack=0, active=1, total_invested=amount) for position, amount in investments.items()]
+        get_pots(players, dict(investments))
+        return 1
+
+    return {'pots.get_pots.calls_per_sec': rate(call, min_seconds)}
@@ -0,0 +1,109 @@
+""" Throughput benchmarks for the engine, views and hand evaluator.
+
+python -m benchmarks                          run everything, compare with benchmarks/baseline.json
+python -m benchmarks engine views             run some suites
+python -m benchmarks --output results.json    write the results
+python -m benchmarks --save-baseline          replace the stored baseline with this run
+
+Every metric is a rate, higher is better. """
+import argparse
+import json
+import pathlib
+import platform
+import subprocess
+import sys
+import time
+import numpy as np
+from benchmarks import common, engine, views, evaluator, pots
+
+SUITES = {
+    'engine': engine.run,
+    'views': views.run,
+    'evaluator': evaluator.run,
+    'pots': pots.run,
+}
+BASELINE_PATH = pathlib.Path(__file__).parent / 'baseline.json'
+
+
+def metadata():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, cwd=common.SRC_DIR).stdout.strip()
+    except OSError:
+        commit = ''
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'system': platform.system(),
+    }
+
+
+# Metadata that has to match the baseline's for its numbers to be comparable
+ENVIRONMENT_KEYS = ('python', 'numpy', 'machine', 'system')
+
+
+def environment_mismatches(current, baseline):
+    """ (key, baseline value, current value) of every environment key that differs """
+    return [(key, baseline.get(key), current[key]) for key in ENVIRONMENT_KEYS if baseline.get(key) != current[key]]
+
+
+def compare(results, baseline, tolerance):
+    """ Ratio of every metric to the baseline. Metrics below 1 - tolerance are regressions. """
+    comparison = {}
+    for name, value in results.items():
+        if name in baseline:
+            ratio = value / baseline[name]
+            comparison[name] = {'baseline': baseline[name], 'current': value, 'ratio': ratio, 'regression': ratio < 1 - tolerance}
+    return comparison
+
+
+def print_report(results, comparison):
+    width = max(len(name) for name in results)
+    for name, value in results.items():
+        line = f'{name:<{width}}  {value:>14,.0f}'
+        if name in comparison:
+            line += f'  {comparison[name]["ratio"]:6.2f}x baseline'
+            if comparison[name]['regression']:
+                line += '  REGRESSION'
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('suites', nargs='*', help=f'suites to run, any of {", ".join(SUITES)}. Default all')
+    parser.add_argument('--min-seconds', type=float, default=1.0, help='time spent on each metric')
+    parser.add_argument('--output', help='write the results as JSON to this path')
+    parser.add_argument('--baseline', default=str(BASELINE_PATH), help='baseline JSON to compare against')
+    parser.add_argument('--save-baseline', action='store_true', help='write the results to the baseline path')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='slowdown that counts as a regression')
+    parser.add_argument('--fail-on-regression', action='store_true', help='exit with status 1 if any metric regressed')
+    args = parser.parse_args(argv)
+    unknown = set(args.suites) - set(SUITES)
+    if unknown:
+        parser.error(f'unknown suites {", ".join(sorted(unknown))}')
+
+    results = {}
+    for suite in args.suites or SUITES:
+        results.update(SUITES[suite](args.min_seconds))
+
+    baseline_path = pathlib.Path(args.baseline)
+    stored = json.loads(baseline_path.read_text()) if baseline_path.exists() else {'metadata': {}, 'results': {}}
+    baseline = stored['results']
+    comparison = compare(results, baseline, args.tolerance)
+    report = {'metadata': metadata(), 'results': results, 'comparison': comparison}
+    print_report(results, comparison)
+    if baseline:
+        for key, recorded, current in environment_mismatches(report['metadata'], stored['metadata']):
+            print(f'warning: baseline was recorded with {key} {recorded}, this run has {current}; ratios may not reflect code changes', file=sys.stderr)
+    if args.output:
+        pathlib.Path(args.output).write_text(json.dumps(report, indent=2))
+    if args.save_baseline:
+        baseline_path.write_text(json.dumps({'metadata': report['metadata'], 'results': results}, indent=2))
+    if args.fail_on_regression and any(entry['regression'] for entry in comparison.values()):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+import random
+import numpy as np
+from benchmarks.common import quiet, rate
+from pokerrl_env.config import Config
+from pokerrl_env.transition import init_state, step_state
+from pokerrl_env.view import player_view, json_view, all_player_views
+
+
+def random_histories(config, num_hands, seed=0):
+    random.seed(seed)
+    rng = np.random.default_rng(seed)
+    histories = []
+    with quiet():
+        for _ in range(num_hands):
+            global_states, done, _, action_mask = init_state(config)
+            while not done and action_mask.any():
+                global_states, done, _, action_mask = step_state(global_states, int(rng.choice(np.flatnonzero(action_mask))), config)
+            histories.append(global_states)
+    return histories
+
+
+def run(min_seconds):
+    """ History rows per second through player_view, all_player_views (every seat) and json_view, over finished 6 max hands """
+    config = Config(num_players=6)
+    histories = random_histories(config, 200)
+    position = config.player_positions[0]
+    results = {}
+    for name, view in (('player_view', lambda states: player_view(states, position, config)),
+                       ('json_view', lambda states: json_view(states, position, config)),
+                       ('all_player_views', lambda states: all_player_views(states, config))):
+        index = {'hand': 0}
+
+        def rows():
+            global_states = histories[index['hand'] % len(histories)]
+            index['hand'] += 1
+            view(global_states)
+            return global_states.shape[0]
+
+        results[f'views.{name}.rows_per_sec'] = rate(rows, min_seconds)
+    return results
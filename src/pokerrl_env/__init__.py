@@ -1,8 +1,17 @@
 from .play import play_game
 from .config import Config
 from .view import player_view, human_readable_view, json_view
-from .transition import step_state, init_state
+from .transition import step_state, init_state, snapshot_state, restore_state
 from .datatypes import GameTypes,BetLimits,Positions
 from .utils import return_current_player
 from .game import Game
-from .cardlib import encode, hand_rank
+from .vec_game import VecGame
+from .rollout import RolloutEngine
+from .batches import BatchGenerator
+from .ledger import Ledger
+from .buffer import HistoryBuffer, CompactHistory
+from .cardlib import encode, encode_cards, decode_cards, hand_rank, hand_rank_batch, holdem_hand_rank_batch
+from .hand_history import HandHistoryWriter, HandHistoryReader
+from .game_tree import PublicTree, enumerate_public_tree
+from .dealer import Dealer
+from .server import GameServer, GameClient
@@ -0,0 +1,105 @@
+import numpy as np
+from pokerrl_env.config import Config
+from pokerrl_env.rollout import random_policy
+from pokerrl_env.vec_game import VecGame
+
+
+def return_batch_specs(config: Config, batch_size: int):
+    """ name -> (shape, dtype) of every batch array. Indexed [decision, ...] """
+    return {
+        "observations": ((batch_size, config.player_state_shape), np.float64),
+        "action_masks": ((batch_size, config.num_actions), np.int8),
+        "actions": ((batch_size,), np.int64),
+        "players": ((batch_size,), np.int8),
+        "rewards": ((batch_size,), np.float64),
+        "dones": ((batch_size,), np.bool_),
+        "valid": ((batch_size,), np.bool_),
+    }
+
+
+class BatchGenerator:
+    """ Plays games on a VecGame and yields fixed size training batches of decisions.
+
+    Every decision row holds the acting player's observation (as player_view), action mask and action,
+    the seat that acted, and as reward that player's result for the hand, converted from chips.
+    dones marks the last decision of each hand. Decisions are only emitted once their hand is over;
+    hands left without a legal action have no result and are dropped.
+
+    Iterating is pull based: games are stepped only while the next batch is being filled, so nothing
+    piles up however long it runs. Batches are num_buffers preallocated dicts of arrays used in turn, so a
+    yielded batch stays valid until num_buffers - 1 more have been drawn; copy it to keep it longer.
+    With num_hands set, iteration stops after that many hands and the last batch is zero padded,
+    with valid marking the real rows. seed deals every table from its own Dealer stream (see VecGame). """
+    def __init__(self, config: Config, batch_size: int, num_tables: int = 64, policy=random_policy, num_buffers: int = 2, num_hands: int = None, seed=None):
+        assert num_buffers > 0, "Need at least one batch buffer"
+        self.config = config
+        self.batch_size = batch_size
+        self.policy = policy
+        self.num_hands = num_hands
+        self.vec_game = VecGame(config, num_tables, seed=seed)
+        self.specs = return_batch_specs(config, batch_size)
+        self.buffers = [{key: np.zeros(shape, dtype=dtype) for key, (shape, dtype) in self.specs.items()} for _ in range(num_buffers)]
+        # Decisions of the hand in progress on every table, waiting for its result
+        self.pending = {key: np.zeros((num_tables, config.max_history_rows) + shape[1:], dtype=dtype)
+                        for key, (shape, dtype) in self.specs.items() if key in ("observations", "action_masks", "actions", "players")}
+        self.pending_counts = np.zeros(num_tables, dtype=np.int64)
+        self.reward_index = np.zeros(7, dtype=np.intp)
+        self.reward_index[config.player_positions] = np.arange(config.num_players)
+        self.hands_played = 0
+
+    def __iter__(self):
+        vec_game = self.vec_game
+        tables = np.arange(vec_game.num_tables)
+        observations, action_masks = vec_game.reset()
+        self.pending_counts[:] = 0
+        self.hands_played = 0
+        batch, fill, batches_yielded = self.buffers[0], 0, 0
+        while self.num_hands is None or self.hands_played < self.num_hands:
+            if self.pending_counts.max() == self.pending["actions"].shape[1]:
+                self._grow()
+            actions = self.policy(observations, action_masks)
+            rows = self.pending_counts
+            self.pending["observations"][tables, rows] = observations
+            self.pending["action_masks"][tables, rows] = action_masks
+            self.pending["actions"][tables, rows] = actions
+            self.pending["players"][tables, rows] = vec_game.current_players
+            self.pending_counts += 1
+            observations, action_masks, rewards, dones = vec_game.step(actions)
+            for table in np.flatnonzero(dones):
+                count = self.pending_counts[table]
+                self.pending_counts[table] = 0
+                if vec_game.truncated[table]:
+                    continue
+                if self.num_hands is not None and self.hands_played == self.num_hands:
+                    break
+                self.hands_played += 1
+                players = self.pending["players"][table, :count]
+                hand_rewards = rewards[table, self.reward_index[players]]
+                start = 0
+                while start < count:
+                    take = min(count - start, self.batch_size - fill)
+                    rows = slice(fill, fill + take)
+                    for key in self.pending:
+                        batch[key][rows] = self.pending[key][table, start:start + take]
+                    batch["rewards"][rows] = hand_rewards[start:start + take]
+                    batch["dones"][rows] = False
+                    batch["valid"][rows] = True
+                    start += take
+                    fill += take
+                    if start == count:
+                        batch["dones"][fill - 1] = True
+                    if fill == self.batch_size:
+                        yield batch
+                        batches_yielded += 1
+                        batch, fill = self.buffers[batches_yielded % len(self.buffers)], 0
+        if fill:
+            for array in batch.values():
+                array[fill:] = 0
+            yield batch
+
+    def _grow(self):
+        """ A hand outgrew the pending buffers, double them """
+        for key, array in self.pending.items():
+            grown = np.zeros((array.shape[0], 2 * array.shape[1]) + array.shape[2:], dtype=array.dtype)
+            grown[:, :array.shape[1]] = array
+            self.pending[key] = grown
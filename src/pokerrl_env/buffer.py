@@ -0,0 +1,125 @@
+from functools import lru_cache
+import numpy as np
+from pokerrl_env.config import return_layouts, return_mappings
+
+
+class HistoryBuffer:
+    """ Preallocated storage for the global states of a hand.
+
+    init_state and step_state write rows straight into the buffer and return views of it,
+    so no history is copied per step. The buffer is reused across hands, so views returned
+    for a previous hand are overwritten after reset; copy them to keep them around. """
+    def __init__(self, config, max_rows=None, rows=None):
+        """ rows: optional preallocated (max_rows, global_state_shape) array to write into, e.g. a slice of a larger block """
+        self.config = config
+        if rows is None:
+            rows = np.zeros((max_rows or config.max_history_rows, config.global_state_shape), dtype=config.state_dtype)
+        self.rows = rows
+        self.length = 0
+
+    def reset(self):
+        self.length = 0
+
+    def reserve(self, num_rows: int):
+        """ Make sure there is room for num_rows more rows. Doubles the buffer if the hand outgrows it. """
+        required = self.length + num_rows
+        if required > self.rows.shape[0]:
+            rows = np.zeros((max(required, 2 * self.rows.shape[0]), self.rows.shape[1]), dtype=self.rows.dtype)
+            rows[:self.length] = self.rows[:self.length]
+            self.rows = rows
+
+    def slots(self, num_rows: int) -> np.ndarray:
+        """ View of the next num_rows unused rows. They are committed with advance. """
+        self.reserve(num_rows)
+        return self.rows[self.length:self.length + num_rows]
+
+    def advance(self, num_rows: int):
+        self.length += num_rows
+
+    def append(self, global_states: np.ndarray):
+        global_states = np.atleast_2d(global_states)
+        self.slots(global_states.shape[0])[:] = global_states
+        self.advance(global_states.shape[0])
+
+    def view(self) -> np.ndarray:
+        return self.rows[:self.length]
+
+    def truncate(self, length: int):
+        """ Drop the rows after the first length. Rows are only ever appended, so the rows kept are unchanged """
+        assert 0 <= length <= self.length, f"Can't truncate {self.length} rows to {length}"
+        self.length = length
+
+    def compact(self):
+        """ Copy of the hand so far as a CompactHistory """
+        return CompactHistory.from_states(self.view(), self.config)
+
+
+@lru_cache(maxsize=None)
+def return_static_columns(game_type):
+    """ (static, dynamic) global state columns. Static columns are fixed once a hand is dealt:
+    hole cards, the board, positions and the number of players. The rest change with the action. """
+    gl, _ = return_layouts(game_type)
+    _, _, _, global_state_shape = return_mappings(game_type)
+    static = np.sort(np.concatenate([gl.hand_columns[1:].ravel(), gl.board_columns, gl.position[1:], [gl.num_players]]))
+    dynamic = np.setdiff1d(np.arange(global_state_shape), static)
+    static.setflags(write=False)
+    dynamic.setflags(write=False)
+    return static, dynamic
+
+
+class CompactHistory:
+    """ History of a hand with the static columns stored once.
+
+    Only the dynamic columns (stacks, active flags, pot, street, action fields) are kept per row,
+    which for Omaha is 26 of the 91 columns. view and materialize rebuild full global state rows. """
+    def __init__(self, config, max_rows=None):
+        self.config = config
+        self.static_columns, self.dynamic_columns = return_static_columns(config.game_type)
+        self.static = np.zeros(self.static_columns.size, dtype=config.state_dtype)
+        self.dynamic = np.zeros((max_rows or config.max_history_rows, self.dynamic_columns.size), dtype=config.state_dtype)
+        self.length = 0
+        self._rows = None
+
+    @classmethod
+    def from_states(cls, global_states: np.ndarray, config):
+        history = cls(config, max_rows=global_states.shape[0])
+        history.append(global_states)
+        return history
+
+    def reset(self):
+        self.length = 0
+
+    def reserve(self, num_rows: int):
+        """ Make sure there is room for num_rows more rows. Doubles the buffer if the hand outgrows it. """
+        required = self.length + num_rows
+        if required > self.dynamic.shape[0]:
+            dynamic = np.zeros((max(required, 2 * self.dynamic.shape[0]), self.dynamic.shape[1]), dtype=self.dynamic.dtype)
+            dynamic[:self.length] = self.dynamic[:self.length]
+            self.dynamic = dynamic
+
+    def append(self, global_states: np.ndarray):
+        """ Add full global state rows. The static columns are taken from the first row of the hand. """
+        global_states = np.atleast_2d(global_states)
+        if self.length == 0:
+            self.static[:] = global_states[0, self.static_columns]
+        self.reserve(global_states.shape[0])
+        self.dynamic[self.length:self.length + global_states.shape[0]] = global_states[:, self.dynamic_columns]
+        self.length += global_states.shape[0]
+
+    def materialize(self, out=None) -> np.ndarray:
+        """ Full (length, global_state_shape) rows, written into out if given """
+        if out is None:
+            out = np.empty((self.length, self.config.global_state_shape), dtype=self.dynamic.dtype)
+        out[:, self.static_columns] = self.static
+        out[:, self.dynamic_columns] = self.dynamic[:self.length]
+        return out
+
+    def view(self) -> np.ndarray:
+        """ Full rows, materialized into an array that is reused on every call; copy it to keep it """
+        if self._rows is None or self._rows.shape[0] < self.length:
+            self._rows = np.empty((self.dynamic.shape[0], self.config.global_state_shape), dtype=self.dynamic.dtype)
+        return self.materialize(self._rows[:self.length])
+
+    @property
+    def nbytes(self) -> int:
+        return self.static.nbytes + self.dynamic[:self.length].nbytes
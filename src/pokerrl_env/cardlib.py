@@ -1,4 +1,8 @@
 import ctypes
+import os
+import time
+import warnings
+import numpy as np
 from os import path
 from sys import platform, argv
 import pathlib
@@ -7,16 +11,106 @@ parent_dir = pathlib.Path(__file__).parent.parent.absolute()
 release_dir = parent_dir / 'rusteval' / 'target' / 'release' 
 if platform == "linux" or platform == "linux2":
     # linux
-    lib = ctypes.cdll.LoadLibrary(path.join(release_dir, "librusteval.so"))
+    lib_name = "librusteval.so"
 elif platform == "darwin":
     # OS X
-    lib_path = path.join(release_dir, "librusteval.dylib")
-    lib = ctypes.cdll.LoadLibrary(path.join(release_dir, "librusteval.dylib"))
+    lib_name = "librusteval.dylib"
 else:
     # Windows...
-    lib_path = path.join(release_dir, "librusteval.dll")
-    lib = ctypes.cdll.LoadLibrary(path.join(release_dir, "librusteval.dll"))
+    lib_name = "librusteval.dll"
 
+# The library is loaded on the first evaluation, not at import. Its path is, in order: set_library_path,
+# the POKERRL_RUSTEVAL environment variable, then the cargo release build.
+# POKERRL_BACKEND picks the evaluator backend: 'rust', 'numpy', or 'auto' (default) to use rust when the library loads.
+BACKENDS = ('auto', 'rust', 'numpy')
+_library_path = None
+_backend = os.environ.get('POKERRL_BACKEND', 'auto')
+# path that failed to load under 'auto', so it isn't retried on every evaluation
+_failed_path = None
+lib = None
+
+def library_path():
+    return _library_path or os.environ.get('POKERRL_RUSTEVAL') or path.join(release_dir, lib_name)
+
+def set_library_path(library_path):
+    """ Load librusteval from library_path. Takes effect on the next evaluation. """
+    global _library_path, lib
+    _library_path = library_path
+    lib = None
+
+def set_backend(name):
+    """ 'rust', 'numpy' or 'auto' """
+    global _backend
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown backend {name}, expected one of {list(BACKENDS)}")
+    _backend = name
+
+def get_backend():
+    """ The backend evaluations run on, loading the library if that hasn't happened yet """
+    global _failed_path
+    if _backend == 'numpy':
+        return 'numpy'
+    if lib is not None:
+        return 'rust'
+    if _backend == 'auto' and _failed_path == library_path():
+        return 'numpy'
+    try:
+        load_library()
+    except OSError as error:
+        if _backend == 'rust':
+            raise
+        _failed_path = library_path()
+        warnings.warn(f"Couldn't load {_failed_path} ({error}), evaluating hands with NumPy")
+        return 'numpy'
+    return 'rust'
+
+def load_library():
+    """ Loads librusteval. Raises OSError if it can't be loaded """
+    global lib
+    if lib is None:
+        native = ctypes.cdll.LoadLibrary(library_path())
+        native.hand_with_board_rank_batch.argtypes = [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_void_p, ctypes.c_size_t]
+        native.hand_with_board_rank_batch.restype = None
+        native.holdem_hand_with_board_rank_batch.argtypes = [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_void_p, ctypes.c_size_t]
+        native.holdem_hand_with_board_rank_batch.restype = None
+        native.equity.argtypes = [ctypes.c_void_p, ctypes.c_size_t, ctypes.c_size_t, ctypes.c_void_p, ctypes.c_size_t,
+                                  ctypes.c_void_p, ctypes.c_size_t, ctypes.c_size_t, ctypes.c_uint64, ctypes.c_size_t, ctypes.c_void_p]
+        native.equity.restype = ctypes.c_long
+        native.set_evaluator(EVALUATORS[_evaluator])
+        lib = native
+    return lib
+
+def _native():
+    """ The loaded library, or None when hands are evaluated with NumPy """
+    if lib is not None and _backend != 'numpy':
+        return lib
+    return lib if get_backend() == 'rust' else None
+
+def _rust_only(name):
+    native = _native()
+    if native is None:
+        raise RuntimeError(f"{name} needs the rusteval library, which isn't loaded")
+    return native
+
+
+# dtype matching ctypes.c_long, the card type the rust functions take
+CARD_DTYPE = np.dtype(ctypes.c_long)
+
+PRIMES = [2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41]
+STR_SUIT_TO_INT = {'s': 1, 'h': 2, 'd': 3, 'c': 4}
+
+def _build_encoding_table():
+    """ Cactus kev encoding of every (rank, suit) the engine uses. Same bits as encode.rs. Row and column 0 are padding and encode to 0. """
+    table = np.zeros((14, 5), dtype=CARD_DTYPE)
+    for rank in range(13):
+        for suit in range(4):
+            table[rank + 1, suit + 1] = (1 << (12 + suit)) | (1 << (16 + rank)) | (rank << 8) | PRIMES[rank]
+    table.setflags(write=False)
+    return table
+
+ENCODING_TABLE = _build_encoding_table()
+# suit bits (encoded >> 12) back to the engine suit
+SUIT_BITS_TO_SUIT = np.array([0, 1, 2, 0, 3, 0, 0, 0, 4])
 
 # takes [2,'s'] or [2,1] and returns the cactus kev encoding for that card
 def encode(card):
@@ -26,8 +120,22 @@ def encode(card):
     """
     suitnum = card[1]
     if isinstance(card[1],str):
-        suitnum = {'s': 1, 'h': 2,'d': 3,'c': 4}.get(card[1], 0)
-    return lib.encode(ctypes.c_byte(card[0] - 1), ctypes.c_byte(suitnum - 1))
+        suitnum = STR_SUIT_TO_INT.get(card[1], 0)
+    return int(ENCODING_TABLE[card[0], suitnum])
+
+# takes cards in the engine layout, an array (..., 2N) of rank,suit pairs,
+# and returns the cactus kev encodings as an (..., N) array. Padding (0,0) encodes to 0.
+def encode_cards(cards):
+    cards = np.asarray(cards).astype(np.intp)
+    return ENCODING_TABLE[cards[..., 0::2], cards[..., 1::2]]
+
+# inverse of encode_cards, returns the engine layout (..., 2N)
+def decode_cards(encoded):
+    encoded = np.asarray(encoded, dtype=CARD_DTYPE)
+    cards = np.empty(encoded.shape[:-1] + (2 * encoded.shape[-1],), dtype=np.intp)
+    cards[..., 0::2] = np.where(encoded > 0, ((encoded >> 8) & 0xF) + 1, 0)
+    cards[..., 1::2] = SUIT_BITS_TO_SUIT[(encoded >> 12) & 0xF]
+    return cards
 
 # takes a cactus kev encoded card and returns a list like [2,'s']
 def decode(encoded):
@@ -35,28 +143,133 @@ def decode(encoded):
     suit = ['','s','h','','d','','','','c'][(encoded >> 12) & 0xF]
     return [rank, suit]
 
+def _compare(rank1, rank2):
+    return 1 if rank1 < rank2 else -1 if rank1 > rank2 else 0
+
 # takes two 4-card hands and a 5-card board and
 # returns 1 for hand1 wins, -1 for hand2 wins, or 0 for tie
 def winner(hand1, hand2, board):
-    return lib.winner(long_array(hand1), long_array(hand2), long_array(board))
+    native = _native()
+    if native is None:
+        return _compare(*hand_rank_batch([hand1, hand2], board))
+    return native.winner(long_array(hand1), long_array(hand2), long_array(board))
 
 # takes two 2-card hands and a 5-card board and
 # returns 1 for hand1 wins, -1 for hand2 wins, or 0 for tie
 def holdem_winner(hand1, hand2, board):
-    return lib.holdem_winner(long_array(hand1), long_array(hand2), long_array(board))
+    native = _native()
+    if native is None:
+        return _compare(*holdem_hand_rank_batch([hand1, hand2], board))
+    return native.holdem_winner(long_array(hand1), long_array(hand2), long_array(board))
 
 # takes a 4 card hand and a 5 card board and returns the best rank of the 60 possible combinations
 def hand_rank(hand, board):
-    return lib.hand_with_board_rank(long_array(hand), long_array(board))
+    native = _native()
+    if native is None:
+        return int(hand_rank_batch([hand], board)[0])
+    return native.hand_with_board_rank(long_array(hand), long_array(board))
 
 def holdem_hand_rank(hand, board):
-    return lib.holdem_hand_with_board_rank(long_array(hand), long_array(board))
+    native = _native()
+    if native is None:
+        return int(holdem_hand_rank_batch([hand], board)[0])
+    return native.holdem_hand_with_board_rank(long_array(hand), long_array(board))
+# Omaha evaluators in rusteval. combos ranks all 60 combinations one by one,
+# lookup reuses the board triples across combinations and finds paired hands in a hash table.
+# The NumPy backend has a single evaluator and ignores the setting.
+EVALUATORS = {'combos': 0, 'lookup': 1}
+
+def set_evaluator(name):
+    """ Select the Omaha evaluator used by hand_rank, winner and hand_rank_batch """
+    global _evaluator
+    if name not in EVALUATORS:
+        raise ValueError(f"Unknown evaluator {name}, expected one of {list(EVALUATORS)}")
+    _evaluator = name
+    if lib is not None:
+        lib.set_evaluator(EVALUATORS[name])
+
+def get_evaluator():
+    return _evaluator
+
+# Applied when the library is loaded. Override with the POKERRL_EVALUATOR environment variable.
+_evaluator = 'lookup'
+set_evaluator(os.environ.get('POKERRL_EVALUATOR', 'lookup'))
+
+def _rank_batch(batch_name, hands, boards, hand_size):
+    hands = np.ascontiguousarray(hands, dtype=CARD_DTYPE)
+    assert hands.ndim == 2 and hands.shape[1] == hand_size, f"hands must have shape (M, {hand_size}), got {hands.shape}"
+    boards = np.ascontiguousarray(np.broadcast_to(boards, (hands.shape[0], 5)), dtype=CARD_DTYPE)
+    native = _native()
+    if native is None:
+        from pokerrl_env import numpy_eval
+        return getattr(numpy_eval, batch_name)(hands, boards)
+    ranks = np.empty(hands.shape[0], dtype=np.intc)
+    batch_fn = native.hand_with_board_rank_batch if hand_size == 4 else native.holdem_hand_with_board_rank_batch
+    batch_fn(hands.ctypes.data, boards.ctypes.data, ranks.ctypes.data, hands.shape[0])
+    return ranks
+
+# takes M 4 card hands (M,4) and M 5 card boards (M,5), or a single board (5,) shared by every hand,
+# and returns the best rank of each hand as an (M,) array. One call into rust for the whole batch.
+def hand_rank_batch(hands, boards):
+    return _rank_batch('hand_rank_batch', hands, boards, 4)
+
+# holdem version of hand_rank_batch, hands are (M,2)
+def holdem_hand_rank_batch(hands, boards):
+    return _rank_batch('holdem_hand_rank_batch', hands, boards, 2)
+
+# Equity of 2-6 encoded hands, all Omaha (4 cards) or all Holdem (2 cards), as an array of pot shares with ties split.
+# board holds the 0-5 known board cards and dead any cards that can't come.
+# Turn and river boards are enumerated exhaustively, as are all boards when iterations is 0.
+# Earlier streets run iterations Monte Carlo boards, reproducible for a given seed on any number of threads.
+def equity(hands, board=(), dead=(), iterations=100_000, seed=None, num_threads=None):
+    hands = np.ascontiguousarray(hands, dtype=CARD_DTYPE)
+    board = np.ascontiguousarray(board, dtype=CARD_DTYPE)
+    dead = np.ascontiguousarray(dead, dtype=CARD_DTYPE)
+    assert hands.ndim == 2 and hands.shape[1] in (2, 4), f"hands must have shape (num_players, 4) or (num_players, 2), got {hands.shape}"
+    if seed is None:
+        seed = int(np.random.SeedSequence().generate_state(1, dtype=np.uint64)[0])
+    equities = np.zeros(hands.shape[0], dtype=np.float64)
+    num_boards = _rust_only('equity').equity(hands.ctypes.data, hands.shape[0], hands.shape[1], board.ctypes.data, board.size,
+                            dead.ctypes.data, dead.size, iterations, seed, num_threads or os.cpu_count() or 1, equities.ctypes.data)
+    if num_boards < 0:
+        raise ValueError("Invalid equity input: expected 2-6 hands, at most 5 board cards, no duplicate cards and enough cards left to complete the board")
+    return equities
+
+# Ranks num_hands random Omaha deals with every evaluator. Returns the ranks per second of each evaluator
+# and the number of hands where any evaluator disagrees with combos, the reference.
+def compare_evaluators(num_hands=1_000_000, seed=0, chunk_size=100_000):
+    _rust_only('compare_evaluators')
+    rng = np.random.default_rng(seed)
+    deck = ENCODING_TABLE[1:, 1:].reshape(-1)
+    previous = get_evaluator()
+    seconds = {name: 0.0 for name in EVALUATORS}
+    mismatches = 0
+    try:
+        for start in range(0, num_hands, chunk_size):
+            size = min(chunk_size, num_hands - start)
+            cards = deck[np.argsort(rng.random((size, 52)), axis=1)[:, :9]]
+            ranks = {}
+            for name in EVALUATORS:
+                set_evaluator(name)
+                tic = time.perf_counter()
+                ranks[name] = hand_rank_batch(cards[:, :4], cards[:, 4:])
+                seconds[name] += time.perf_counter() - tic
+            reference = ranks['combos']
+            mismatches += int(np.count_nonzero(np.any([r != reference for r in ranks.values()], axis=0)))
+    finally:
+        set_evaluator(previous)
+    return {'ranks_per_second': {name: num_hands / seconds[name] for name in EVALUATORS}, 'mismatches': mismatches}
+
 # for converting an array to a c array for passing to rust
 def long_array(arr):
     return (ctypes.c_long * len(arr))(*arr)
 
 def rank(hand):
-    return lib.rank(*hand)
+    native = _native()
+    if native is None:
+        from pokerrl_env import numpy_eval
+        return int(numpy_eval.rank(hand))
+    return native.rank(*hand)
 
 # example usage:
 """
@@ -74,4 +287,5 @@ RANKS: Accepts numbers 2-14 inclusive.
 >>> holdem_hand = [[14, 'c'], [2, 's']]
 >>> holdem_hand_en = [encode(c) for c in holdem_hand]
 >>> holdem_hand_rank(holdem_hand_en,en_board)
+>>> hand_rank_batch([hand_en,hand2_en],en_board)
 """
\ No newline at end of file
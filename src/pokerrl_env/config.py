@@ -1,22 +1,48 @@
-from pokerrl_env.datatypes import CALL, CHECK, FOLD, INT_POSITIONS_BY_NUM_PLAYERS, PREFLOP_ORDER_BY_NUM_PLAYERS, POSITION_TO_SEAT, PLAYERS_POSITIONS_DICT, BetLimits, GameTypes, Street
+from functools import lru_cache
+import re
+import numpy as np
+from pokerrl_env.datatypes import CALL, CHECK, FOLD, HOLE_CARDS_BY_GAME_TYPE, INT_POSITIONS_BY_NUM_PLAYERS, PREFLOP_ORDER_BY_NUM_PLAYERS, POSITION_TO_SEAT, PLAYERS_POSITIONS_DICT, BetLimits, GameTypes, Street
 from pokerrl_env.utils import calculate_fixed_limit_mask, calculate_no_limit_betsize, calculate_pot_limit_betsize, calculate_pot_limit_mask, calculate_no_limit_mask, return_deck
 
 class Config:
     def __init__(self, game_type=GameTypes.OMAHA_HI, num_players=2, bet_limit=BetLimits.POT_LIMIT,
                  betsizes=(1, 0.9, 0.75, 0.67, 0.5, 0.33, 0.25, 0.1),
-                 blinds=(0.5,1), stack_sizes=100,is_server=False):
+                 blinds=(0.5,1), stack_sizes=100,is_server=False,validate_ledger=False,
+                 chip_units=None,state_dtype=None):
+        """ chip_units: store amounts as whole chips, chip_units chips per unit of blinds and stack_sizes
+        (chip_units=100 with blinds (0.5,1) counts in hundredths of a big blind). Bets are rounded to whole chips
+        and pots split exactly. Global states and winnings are in chips; views convert back with from_chips.
+        state_dtype: dtype of global states. Defaults to int32 with chip_units, float64 without. """
         assert num_players >= 2, "Number of players must be at least 2"
         assert bet_limit in [BetLimits.POT_LIMIT, BetLimits.NO_LIMIT, BetLimits.FIXED_LIMIT], "Bet limit must be one of Pot limit, No limit, or Fixed limit"
         assert len(betsizes) > 0, "Betsizes must be a non-empty tuple"
         assert len(blinds) == 2, "Blinds must be a tuple of length 2"
         assert stack_sizes > 0, "Stack sizes must be a positive integer"
         self.is_server = is_server
+        self.validate_ledger = validate_ledger
         self.game_type = game_type
         self.num_players = num_players
         self.bet_limit = bet_limit
         self.betsizes = betsizes
+        self.chip_units = chip_units
+        if state_dtype is None:
+            state_dtype = np.int32 if chip_units else np.float64
+        self.state_dtype = np.dtype(state_dtype)
+        if chip_units:
+            assert np.issubdtype(self.state_dtype, np.integer), "Chip units need an integer state dtype"
+            for amount in (*blinds, *np.atleast_1d(stack_sizes)):
+                assert abs(amount * chip_units - round(amount * chip_units)) < 1e-9, f"{amount} is not a whole number of chips with chip_units={chip_units}"
+            blinds = tuple(self.to_chips(blind) for blind in blinds)
+            stack_sizes = self.to_chips(stack_sizes) if isinstance(stack_sizes, (int, float)) else [self.to_chips(stack) for stack in stack_sizes]
+            total_chips = stack_sizes * num_players if isinstance(stack_sizes, int) else sum(stack_sizes)
+            # Bet sizing adds up to the pot plus twice the last raise in the state dtype, so leave room for 3x the chips in play
+            assert 3 * total_chips <= np.iinfo(self.state_dtype).max, f"{total_chips} chips in play overflow {self.state_dtype} during bet sizing"
+        else:
+            assert not np.issubdtype(self.state_dtype, np.integer), "Integer states need chip_units"
         self.blinds = blinds
         self.stack_sizes = stack_sizes
+        # Everything in the config that action_options depends on, as its cache key
+        self.betting_key = (bet_limit, tuple(betsizes), blinds[0], bool(chip_units))
         self.action_strs = [FOLD, CHECK, CALL]
         self.action_type_to_int = {a: i for i, a in enumerate(self.action_strs, start=1)}
         self.action_betsize_to_int = {b: i for i, b in enumerate(betsizes, start=4)}
@@ -27,6 +53,10 @@ class Config:
         self.num_actions = len(betsizes) + len(self.action_strs)
         self.player_positions = INT_POSITIONS_BY_NUM_PLAYERS[num_players]
         self.player_state_mapping, self.player_state_shape,self.global_state_mapping,self.global_state_shape = return_mappings(game_type)
+        self.hole_cards = HOLE_CARDS_BY_GAME_TYPE[game_type]
+        self.global_layout, self.player_layout = return_layouts(game_type)
+        # Initial size of a HistoryBuffer. Covers the blinds, a few rounds of betting on every street and the street transitions. Buffers grow if a hand runs longer.
+        self.max_history_rows = 8 * (num_players + 2)
         if bet_limit == BetLimits.POT_LIMIT:
             self.return_action_mask = calculate_pot_limit_mask
             self.return_betsize = calculate_pot_limit_betsize
@@ -43,10 +73,90 @@ class Config:
     @staticmethod
     def convert_model_action_to_state(model_action):
         return model_action + 1
+
+    def to_chips(self, amount):
+        """ Amount in blinds units to whole chips. Unchanged without chip_units """
+        if not self.chip_units:
+            return amount
+        return int(round(amount * self.chip_units))
+
+    def from_chips(self, chips):
+        """ Inverse of to_chips, as float """
+        if not self.chip_units:
+            return chips
+        return chips / self.chip_units
     
 
+class StateLayout:
+    """ Integer column indices compiled once from a state mapping.
+
+    Scalar fields become int attributes named after their key (layout.pot, layout.street).
+    Per seat fields (player_{i}_* in the global mapping, vil_{i}_* in the player mapping) become
+    frozen index arrays indexed by seat or villain number (layout.stack[position]); index 0 is unused.
+    Ranges become slices (layout.board, layout.hand[position]) plus frozen column arrays (layout.board_columns, layout.hand_columns). """
+    def __init__(self, mapping: dict):
+        seat_fields = {}
+        for key, value in mapping.items():
+            match = re.fullmatch(r'(?:player|vil)_(\d)_(\w+)', key)
+            if match:
+                seat_fields.setdefault(match.group(2), {})[int(match.group(1))] = value
+            elif isinstance(value, list):
+                name = key[:-len('_range')]
+                setattr(self, name, slice(*value))
+                setattr(self, f'{name}_columns', self._freeze(np.arange(*value)))
+            else:
+                setattr(self, key, value)
+        for field, seats in seat_fields.items():
+            num_seats = max(seats) + 1
+            if field.endswith('_range'):
+                name = field[:-len('_range')]
+                width = max(end - start for start, end in seats.values())
+                columns = np.zeros((num_seats, width), dtype=np.intp)
+                slices = [slice(0, 0)] * num_seats
+                for seat, (start, end) in seats.items():
+                    columns[seat] = np.arange(start, end)
+                    slices[seat] = slice(start, end)
+                setattr(self, name, tuple(slices))
+                setattr(self, f'{name}_columns', self._freeze(columns))
+            else:
+                columns = np.zeros(num_seats, dtype=np.intp)
+                for seat, column in seats.items():
+                    columns[seat] = column
+                setattr(self, field, self._freeze(columns))
+
+    @staticmethod
+    def _freeze(array: np.ndarray) -> np.ndarray:
+        array.setflags(write=False)
+        return array
+
+
+@lru_cache(maxsize=None)
+def return_layouts(game_type):
+    """ Compiled (global, player) layouts. Cached, so every config of a game type shares them. """
+    player_state_mapping, _, global_state_mapping, _ = return_mappings(game_type)
+    return StateLayout(global_state_mapping), StateLayout(player_state_mapping)
+
+
+def narrow_hand_ranges(mapping, shape, hand_width):
+    """ Copy of mapping with every hand range cut to hand_width columns and the columns after them moved down. Returns (mapping, shape) """
+    removed = [column for key, value in mapping.items() if key.endswith('hand_range') for column in range(value[0] + hand_width, value[1])]
+
+    def shift(column):
+        return column - sum(1 for removed_column in removed if removed_column < column)
+
+    narrowed = {}
+    for key, value in mapping.items():
+        if key.endswith('hand_range'):
+            narrowed[key] = [shift(value[0]), shift(value[0]) + hand_width]
+        elif isinstance(value, list):
+            narrowed[key] = [shift(value[0]), shift(value[1])]
+        else:
+            narrowed[key] = shift(value)
+    return narrowed, shape - len(removed)
+
+
 def return_mappings(game_type):
-    """ In the future will return different mappings depending on the game type """
+    """ (player_state_mapping, player_state_shape, global_state_mapping, global_state_shape) of a game type. Holdem uses the Omaha layout with 2 card hands """
     if game_type == GameTypes.OMAHA_HI:
         player_state_mapping = {
             "hand_range": [0, 8],
@@ -131,7 +241,11 @@ def return_mappings(game_type):
         }
         global_state_shape = 91
     elif game_type == GameTypes.HOLDEM:
-        raise NotImplementedError
+        # The Omaha layout with 2 card hands, so every other field keeps its relative order
+        player_state_mapping, player_state_shape, global_state_mapping, global_state_shape = return_mappings(GameTypes.OMAHA_HI)
+        hand_width = 2 * HOLE_CARDS_BY_GAME_TYPE[GameTypes.HOLDEM]
+        player_state_mapping, player_state_shape = narrow_hand_ranges(player_state_mapping, player_state_shape, hand_width)
+        global_state_mapping, global_state_shape = narrow_hand_ranges(global_state_mapping, global_state_shape, hand_width)
     elif game_type == GameTypes.OMAHA_HI_LO:
         raise NotImplementedError
     elif game_type == 'BIG_O':
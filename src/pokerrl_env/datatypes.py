@@ -62,6 +62,10 @@ INT_TO_STREET = {
     3: 'TURN',
     4: 'RIVER'
 }
+HOLE_CARDS_BY_GAME_TYPE = {
+    GameTypes.HOLDEM: 2,
+    GameTypes.OMAHA_HI: 4,
+}
 BOARD_CARDS_GIVEN_STREET = {
     0: 0,
     1: 0,
@@ -0,0 +1,77 @@
+import numpy as np
+from pokerrl_env.config import Config
+
+# The 52 cards as (rank, suit) pairs, in the order return_deck builds them before shuffling
+CARDS = np.array([(rank, suit) for suit in range(1, 5) for rank in range(1, 14)], dtype=np.uint8)
+CARDS.setflags(write=False)
+
+# A hand draws one double per card of the deck. Philox makes 4 per counter step, so hand i of a stream starts at counter 13 * i
+DRAWS_PER_HAND = len(CARDS)
+COUNTER_STEPS_PER_HAND = DRAWS_PER_HAND // 4
+
+
+def stream_key(seed, stream: int) -> np.ndarray:
+    """ Philox key of a stream, spawned from the root seed """
+    return np.random.SeedSequence(seed, spawn_key=(stream,)).generate_state(2, np.uint64)
+
+
+def shuffle_cards(generator: np.random.Generator, num_hands: int, num_cards: int) -> np.ndarray:
+    """ (num_hands, num_cards) card indices, the first num_cards of an independent shuffle per hand.
+    Only the cards that are dealt get ordered: a partition finds the num_cards lowest of 52 uniforms and just those are sorted. """
+    keys = generator.random((num_hands, DRAWS_PER_HAND))
+    cards = np.argpartition(keys, num_cards - 1, axis=1)[:, :num_cards]
+    order = np.argsort(np.take_along_axis(keys, cards, axis=1), axis=1)
+    return np.take_along_axis(cards, order, axis=1)
+
+
+def write_cards(global_states: np.ndarray, cards: np.ndarray, config: Config):
+    """ Write dealt card indices (..., num_cards) into the hand and board columns of global_states (..., global_state_shape).
+    Seats get hole_cards cards each in config.player_positions order and the board takes the last 5, as init_state deals. """
+    gl = config.global_layout
+    card_pairs = CARDS[cards].reshape(cards.shape[:-1] + (-1,))
+    hand_width = 2 * config.hole_cards
+    num_hands = len(config.player_positions) * hand_width
+    global_states[..., gl.hand_columns[config.player_positions].ravel()] = card_pairs[..., :num_hands]
+    global_states[..., gl.board_columns] = card_pairs[..., num_hands:]
+
+
+class Dealer:
+    """ Deals hands from seeded numpy Generator streams.
+
+    Every stream is a Philox generator keyed from the root seed and the stream number, so any hand can be dealt
+    again from (seed, stream, hand index) alone, on any process, without replaying the ones before it.
+    streams: number of streams, or the stream numbers to use, e.g. the tables one worker runs out of all of them.
+    next_hand draws block_size hands per stream at once and hands them out one by one. """
+    def __init__(self, config: Config, seed=None, streams=1, block_size: int = 64):
+        self.config = config
+        self.root = np.random.SeedSequence(seed)
+        self.seed = self.root.entropy
+        self.streams = list(range(streams)) if isinstance(streams, int) else list(streams)
+        self.num_cards = config.num_players * config.hole_cards + 5
+        self.block_size = block_size
+        self.generators = [np.random.Generator(np.random.Philox(key=stream_key(self.seed, stream))) for stream in self.streams]
+        # Hands drawn from each generator, and the block of them not yet handed out
+        self.hands_drawn = np.zeros(len(self.streams), dtype=np.int64)
+        self.blocks = [np.zeros((0, self.num_cards), dtype=np.intp) for _ in self.streams]
+        self.positions = np.zeros(len(self.streams), dtype=np.int64)
+
+    def deal(self, num_hands: int, stream: int = 0) -> np.ndarray:
+        """ Card indices of the next num_hands hands of stream (an index into streams), shape (num_hands, num_cards) """
+        cards = shuffle_cards(self.generators[stream], num_hands, self.num_cards)
+        self.hands_drawn[stream] += num_hands
+        return cards
+
+    def next_hand(self, stream: int = 0):
+        """ (hand index within the stream, card indices) of the next hand of stream """
+        if self.positions[stream] == self.blocks[stream].shape[0]:
+            self.blocks[stream] = self.deal(self.block_size, stream)
+            self.positions[stream] = 0
+        position = self.positions[stream]
+        self.positions[stream] += 1
+        hand_index = self.hands_drawn[stream] - self.blocks[stream].shape[0] + position
+        return int(hand_index), self.blocks[stream][position]
+
+    def replay(self, stream: int, hand_index: int) -> np.ndarray:
+        """ Card indices of hand hand_index of stream (an index into streams), dealt again from the seed """
+        philox = np.random.Philox(key=stream_key(self.seed, self.streams[stream]), counter=hand_index * COUNTER_STEPS_PER_HAND)
+        return shuffle_cards(np.random.Generator(philox), 1, self.num_cards)[0]
@@ -1,28 +1,93 @@
-from pokerrl_env.transition import init_state, step_state
+from pokerrl_env.transition import init_state, step_state, snapshot_state, restore_state
 from pokerrl_env.config import Config
+from pokerrl_env.ledger import Ledger
+from pokerrl_env.buffer import HistoryBuffer
+from pokerrl_env.dealer import Dealer
 from pokerrl_env.utils import return_current_player
-from pokerrl_env.view import player_view,json_view
+from pokerrl_env.view import player_view,json_view,convert_winnings
 
 class Game:
-    def __init__(self,config:Config):
+    """ Single table. Global states returned by reset and step are views into a buffer that is reused across hands.
+
+    For search, snapshot() captures the hand in O(players) and restore() rewinds to it without copying rows.
+    push() and undo() keep the snapshots on a stack for depth first search. Snapshots belong to the hand they were
+    taken in and are invalidated by reset.
+
+    With a seed, hands are dealt from a Dealer and hand_index is the index of the current hand in its stream.
+    Without one, cards are shuffled with the global random state.
+
+    In server mode with delta set, reset returns the full view and step only the rows added since the last result,
+    so responses stay the same size however long the hand. Every result carries seq, bumped per result, and start,
+    the row its game_states go at: the client keeps rows[:start] and appends game_states. A client that sees seq skip
+    calls sync for the full view. Every row is rendered for seat (default the first of config.player_positions) for
+    the whole hand, so the rebuilt rows always equal json_view(global_state, seat, config). """
+    def __init__(self,config:Config,seed=None,delta=False,seat=None):
         self.config = config
+        self.delta = delta
+        self.seat = config.player_positions[0] if seat is None else seat
+        assert self.seat in config.player_positions, f"Seat {self.seat} is not in a {config.num_players} player game"
+        self.seq = 0
+        self.rows_sent = 0
+        self.dealer = None if seed is None else Dealer(config, seed)
+        self.hand_index = None
         self.global_state = None
         self.done = None
         self.winnings = None
         self.action_mask = None
+        self.ledger = None
+        self.history = HistoryBuffer(config)
+        self.hand_number = 0
+        self.undo_stack = []
 
     def reset(self):
         """ Returns (state, reward, done, info) from the current player's perspective """
-        self.global_state, self.done, self.winnings, self.action_mask = init_state(self.config)
-        current_player = return_current_player(self.global_state,self.config)
-        if self.config.is_server:
-            return {"game_states":json_view(self.global_state,current_player,self.config), "done":self.done, "winnings":self.winnings, "action_mask":self.action_mask.tolist()}
-        return self.global_state, self.done, self.winnings, self.action_mask
+        cards = None
+        if self.dealer is not None:
+            self.hand_index, cards = self.dealer.next_hand()
+        self.global_state, self.done, self.winnings, self.action_mask = init_state(self.config, self.history, cards)
+        self.ledger = Ledger.from_states(self.global_state, self.config)
+        self.hand_number += 1
+        self.undo_stack = []
+        self.rows_sent = 0
+        return self._result()
 
     def step(self,action):
         """ Returns (state, reward, done, info) from the current player's perspective """
-        self.global_state, self.done, self.winnings, self.action_mask = step_state(self.global_state, action, self.config)
+        self.global_state, self.done, self.winnings, self.action_mask = step_state(self.global_state, action, self.config, self.ledger, self.history)
+        return self._result()
+
+    def snapshot(self):
+        """ (hand number, StateSnapshot) of the current point in the hand """
+        return self.hand_number, snapshot_state(self.history, self.ledger, self.done, self.winnings, self.action_mask)
+
+    def restore(self, snapshot):
+        """ Rewind to a snapshot of the hand in progress. Returns the same as step """
+        hand_number, state_snapshot = snapshot
+        assert hand_number == self.hand_number, "Snapshot is from a previous hand"
+        self.global_state, self.done, self.winnings, self.action_mask = restore_state(state_snapshot, self.history, self.ledger)
+        self.rows_sent = min(self.rows_sent, self.global_state.shape[0])
+        return self._result()
+
+    def push(self):
+        """ Save the current point in the hand, to be returned to with undo """
+        self.undo_stack.append(self.snapshot())
+
+    def undo(self):
+        """ Rewind to the last pushed point. Returns the same as step """
+        return self.restore(self.undo_stack.pop())
+
+    def sync(self):
+        """ Server mode: the full view of the hand in progress, for a delta client to resync from """
+        self.rows_sent = 0
+        return self._result()
+
+    def _result(self):
         current_player = return_current_player(self.global_state,self.config)
         if self.config.is_server:
-            return {"game_states":json_view(self.global_state,current_player,self.config), "done":self.done, "winnings":self.winnings, "action_mask":self.action_mask.tolist()}
-        return self.global_state, self.done, self.winnings, self.action_mask
\ No newline at end of file
+            if not self.delta:
+                return {"game_states":json_view(self.global_state,current_player,self.config), "done":self.done, "winnings":convert_winnings(self.winnings,self.config), "action_mask":self.action_mask.tolist()}
+            start = self.rows_sent
+            self.rows_sent = self.global_state.shape[0]
+            self.seq += 1
+            return {"seq":self.seq, "start":start, "game_states":json_view(self.global_state[start:],self.seat,self.config), "done":self.done, "winnings":convert_winnings(self.winnings,self.config), "action_mask":self.action_mask.tolist()}
+        return self.global_state, self.done, self.winnings, self.action_mask
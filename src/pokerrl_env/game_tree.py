@@ -0,0 +1,115 @@
+import numpy as np
+from pokerrl_env.config import Config
+from pokerrl_env.buffer import HistoryBuffer, return_static_columns
+from pokerrl_env.ledger import Ledger
+from pokerrl_env.transition import init_state, step_state, snapshot_state, restore_state
+
+
+class PublicTree:
+    """ Betting tree of a config with the cards left out, as flat arrays indexed by node.
+
+    Nodes are unique public states: hands that reach the same state row (ignoring cards) with the same
+    investments share a node, so the tree is stored as a DAG. parent and action record the first way a node was reached.
+    The children of node i are edge_children[child_offsets[i]:child_offsets[i + 1]], reached by edge_actions.
+    Node 0 is the root, the big blind posted. player is the seat to act, 0 at terminal nodes.
+    stacks and active are ordered as config.player_positions. """
+    def __init__(self, config: Config, nodes: dict, edges: dict, num_duplicates: int):
+        self.config = config
+        self.parent = np.array(nodes['parent'], dtype=np.int32)
+        self.action = np.array(nodes['action'], dtype=np.int8)
+        self.player = np.array(nodes['player'], dtype=np.int8)
+        self.street = np.array(nodes['street'], dtype=np.int8)
+        self.pot = np.array(nodes['pot'], dtype=config.state_dtype)
+        self.stacks = np.array(nodes['stacks'], dtype=config.state_dtype).reshape(-1, config.num_players)
+        self.active = np.array(nodes['active'], dtype=bool).reshape(-1, config.num_players)
+        self.terminal = np.array(nodes['terminal'], dtype=bool)
+        self.child_offsets = np.zeros(self.num_nodes + 1, dtype=np.int64)
+        self.child_offsets[1:] = np.cumsum(np.bincount(edges['parent'], minlength=self.num_nodes))
+        # edges are recorded parent by parent, but children are expanded before their parent's later edges
+        order = np.argsort(np.array(edges['parent'], dtype=np.int64), kind='stable')
+        self.edge_actions = np.array(edges['action'], dtype=np.int8)[order]
+        self.edge_children = np.array(edges['child'], dtype=np.int32)[order]
+        self.num_duplicates = num_duplicates
+
+    @property
+    def num_nodes(self) -> int:
+        return self.parent.shape[0]
+
+    @property
+    def nbytes(self) -> int:
+        return sum(array.nbytes for array in (self.parent, self.action, self.player, self.street, self.pot, self.stacks,
+                                              self.active, self.terminal, self.child_offsets, self.edge_actions, self.edge_children))
+
+    def children(self, node: int):
+        """ (actions, child nodes) of a node """
+        edges = slice(self.child_offsets[node], self.child_offsets[node + 1])
+        return self.edge_actions[edges], self.edge_children[edges]
+
+    def stats(self) -> dict:
+        return {
+            'nodes': self.num_nodes,
+            'terminal_nodes': int(self.terminal.sum()),
+            'edges': int(self.edge_children.shape[0]),
+            'duplicates_merged': self.num_duplicates,
+            'nbytes': self.nbytes,
+        }
+
+
+def enumerate_public_tree(config: Config, max_nodes: int = 1_000_000) -> PublicTree:
+    """ Walks every action sequence from the blinds with step_state, branching with snapshots instead of copying histories.
+
+    step_state only reads the last row and the ledger, so two sequences with the same public columns in their last row
+    and the same investments have the same future and are merged. Raises ValueError past max_nodes; shrink the
+    abstraction (fewer betsizes, shorter stacks) for games that big. """
+    gl = config.global_layout
+    _, public_columns = return_static_columns(config.game_type)
+    positions = list(config.player_positions)
+    history = HistoryBuffer(config)
+    global_states, done, winnings, action_mask = init_state(config, history)
+    ledger = Ledger.from_states(global_states, config)
+    nodes = {key: [] for key in ('parent', 'action', 'player', 'street', 'pot', 'stacks', 'active', 'terminal')}
+    edges = {'parent': [], 'action': [], 'child': []}
+    node_ids = {}
+    num_duplicates = 0
+
+    def add_node(parent, action, global_state, terminal):
+        node = len(nodes['parent'])
+        if node == max_nodes:
+            raise ValueError(f"Public tree has more than {max_nodes} nodes")
+        nodes['parent'].append(parent)
+        nodes['action'].append(action)
+        nodes['player'].append(0 if terminal else int(global_state[gl.current_player]))
+        nodes['street'].append(int(global_state[gl.street]))
+        nodes['pot'].append(global_state[gl.pot])
+        nodes['stacks'].extend(global_state[gl.stack[positions]])
+        nodes['active'].extend(global_state[gl.active[positions]])
+        nodes['terminal'].append(terminal)
+        return node
+
+    def key(global_state):
+        return global_state[public_columns].tobytes(), tuple(ledger.per_street.values()), tuple(ledger.total.values())
+
+    def expand(node, snapshot):
+        # Recursing straight into each new child restores snapshots in stack order, so the rows they point at are never overwritten early
+        nonlocal num_duplicates
+        for action in np.flatnonzero(snapshot.action_mask):
+            global_states, done, _, child_mask = step_state(restore_state(snapshot, history, ledger)[0], int(action), config, ledger, history)
+            terminal = done or not child_mask.any()
+            child_key = key(global_states[-1])
+            child = node_ids.get(child_key)
+            is_new = child is None
+            if is_new:
+                child = node_ids[child_key] = add_node(node, int(action), global_states[-1], terminal)
+            else:
+                num_duplicates += 1
+            edges['parent'].append(node)
+            edges['action'].append(int(action))
+            edges['child'].append(child)
+            if is_new and not terminal:
+                expand(child, snapshot_state(history, ledger, done, None, child_mask))
+
+    root_terminal = done or not action_mask.any()
+    node_ids[key(global_states[-1])] = add_node(-1, -1, global_states[-1], root_terminal)
+    if not root_terminal:
+        expand(0, snapshot_state(history, ledger, done, None, action_mask))
+    return PublicTree(config, nodes, edges, num_duplicates)
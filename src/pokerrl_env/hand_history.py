@@ -0,0 +1,186 @@
+import json
+import os
+from collections import namedtuple
+import numpy as np
+from pokerrl_env.config import Config
+from pokerrl_env.buffer import HistoryBuffer, return_static_columns
+from pokerrl_env.ledger import Ledger
+from pokerrl_env.transition import step_state
+
+# Binary hand history files.
+#
+# <path> holds a header followed by one record per hand, each starting on an 8 byte boundary:
+#   static columns (S values), the dynamic columns of the 2 blind rows (2 x D values),
+#   optionally the dynamic columns of every row of the hand (num_rows x D values), then the actions (uint8).
+# Values use the state dtype of the config that wrote the file. S and D come from return_static_columns.
+# <path>.idx holds one INDEX_DTYPE entry per hand. Records are written before their index entries,
+# so a reader never sees an entry for a partly written hand.
+
+MAGIC = b'PKRLHH01'
+INDEX_DTYPE = np.dtype([('offset', '<i8'), ('num_actions', '<i4'), ('num_rows', '<i4')])
+ALIGNMENT = 8
+
+HandRecord = namedtuple('HandRecord', ['initial_states', 'actions', 'global_states'])
+
+
+def index_path(path):
+    return f'{path}.idx'
+
+
+def _pad(size):
+    return -size % ALIGNMENT
+
+
+def _config_header(config: Config):
+    stack_sizes = config.stack_sizes
+    return {
+        'game_type': config.game_type,
+        'num_players': config.num_players,
+        'bet_limit': config.bet_limit,
+        'betsizes': list(config.betsizes),
+        'blinds': [config.from_chips(blind) for blind in config.blinds],
+        # A single stack for every seat, int or float, or one per seat
+        'stack_sizes': config.from_chips(stack_sizes) if np.ndim(stack_sizes) == 0 else [config.from_chips(stack) for stack in stack_sizes],
+        'chip_units': config.chip_units,
+        'state_dtype': config.state_dtype.str,
+    }
+
+
+def _read_header(path):
+    with open(path, 'rb') as f:
+        magic = f.read(len(MAGIC))
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a hand history file")
+        header_size = int(np.frombuffer(f.read(4), dtype='<u4')[0])
+        header = json.loads(f.read(header_size))
+    data_start = len(MAGIC) + 4 + header_size
+    return header, data_start + _pad(data_start)
+
+
+def replay(initial_states, actions, config: Config):
+    """ Every global state of a hand, rebuilt by stepping the actions from the blind rows """
+    history = HistoryBuffer(config)
+    history.append(initial_states)
+    ledger = Ledger.from_states(history.view(), config)
+    for action in actions:
+        step_state(history.view(), int(action), config, ledger, history)
+    return history.view().copy()
+
+
+class HandHistoryWriter:
+    """ Appends finished hands to a hand history file, creating it if needed.
+
+    Hands are buffered and written chunk_size at a time. With store_rows every row of the hand is stored;
+    otherwise only the blind rows and the actions, and readers replay the rest. """
+    def __init__(self, path, config: Config, store_rows=False, chunk_size=1024):
+        self.path = path
+        self.config = config
+        self.store_rows = store_rows
+        self.chunk_size = chunk_size
+        self.static_columns, self.dynamic_columns = return_static_columns(config.game_type)
+        header = _config_header(config)
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            existing, _ = _read_header(path)
+            if existing != header:
+                raise ValueError(f"{path} was written with a different config: {existing}")
+        else:
+            encoded = json.dumps(header).encode()
+            prefix = MAGIC + np.array([len(encoded)], dtype='<u4').tobytes() + encoded
+            with open(path, 'wb') as f:
+                f.write(prefix + bytes(_pad(len(prefix))))
+            open(index_path(path), 'wb').close()
+        self.offset = os.path.getsize(path)
+        self.data = open(path, 'ab')
+        self.index = open(index_path(path), 'ab')
+        self.chunk = []
+        self.entries = []
+
+    def write(self, global_states: np.ndarray, actions):
+        """ global_states: every row of a finished hand, starting with the blinds. actions: the actions passed to step_state """
+        global_states = np.asarray(global_states, dtype=self.config.state_dtype)
+        actions = np.asarray(actions, dtype=np.uint8)
+        rows = global_states if self.store_rows else global_states[:0]
+        record = b''.join([
+            global_states[0, self.static_columns].tobytes(),
+            global_states[:2, self.dynamic_columns].tobytes(),
+            rows[:, self.dynamic_columns].tobytes(),
+            actions.tobytes(),
+        ])
+        record += bytes(_pad(len(record)))
+        self.chunk.append(record)
+        self.entries.append((self.offset, actions.size, rows.shape[0]))
+        self.offset += len(record)
+        if len(self.chunk) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if not self.chunk:
+            return
+        self.data.write(b''.join(self.chunk))
+        self.data.flush()
+        self.index.write(np.array(self.entries, dtype=INDEX_DTYPE).tobytes())
+        self.index.flush()
+        self.chunk = []
+        self.entries = []
+
+    def close(self):
+        self.flush()
+        self.data.close()
+        self.index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class HandHistoryReader:
+    """ Memory maps a hand history file. Indexing reads one hand, iterating streams them in order.
+    Only the hands that are accessed are paged in, so files larger than memory are fine. """
+    def __init__(self, path):
+        self.path = path
+        header, _ = _read_header(path)
+        self.config = Config(**header)
+        self.static_columns, self.dynamic_columns = return_static_columns(self.config.game_type)
+        self.dtype = self.config.state_dtype
+        self.data = np.memmap(path, dtype=np.uint8, mode='r')
+        num_entries = os.path.getsize(index_path(path)) // INDEX_DTYPE.itemsize
+        self.index = np.memmap(index_path(path), dtype=INDEX_DTYPE, mode='r', shape=(num_entries,)) if num_entries else np.zeros(0, dtype=INDEX_DTYPE)
+
+    def __len__(self):
+        return self.index.shape[0]
+
+    def _values(self, start, count):
+        return self.data[start:start + count * self.dtype.itemsize].view(self.dtype)
+
+    def _rows(self, static, dynamic):
+        rows = np.empty((dynamic.shape[0], self.config.global_state_shape), dtype=self.dtype)
+        rows[:, self.static_columns] = static
+        rows[:, self.dynamic_columns] = dynamic
+        return rows
+
+    def __getitem__(self, hand: int) -> HandRecord:
+        """ The blind rows, the actions (a view of the file) and every row if they were stored, else None """
+        offset, num_actions, num_rows = self.index[hand]
+        num_static, num_dynamic = self.static_columns.size, self.dynamic_columns.size
+        static = self._values(offset, num_static)
+        offset += num_static * self.dtype.itemsize
+        initial = self._values(offset, 2 * num_dynamic).reshape(2, num_dynamic)
+        offset += 2 * num_dynamic * self.dtype.itemsize
+        rows = self._values(offset, num_rows * num_dynamic).reshape(num_rows, num_dynamic)
+        offset += num_rows * num_dynamic * self.dtype.itemsize
+        actions = self.data[offset:offset + num_actions]
+        global_states = self._rows(static, rows) if num_rows else None
+        return HandRecord(self._rows(static, initial), actions, global_states)
+
+    def __iter__(self):
+        for hand in range(len(self)):
+            yield self[hand]
+
+    def global_states(self, hand: int) -> np.ndarray:
+        """ Every row of a hand, stored or replayed """
+        record = self[hand]
+        if record.global_states is not None:
+            return record.global_states
+        return replay(record.initial_states, record.actions, self.config)
@@ -0,0 +1,71 @@
+from collections import namedtuple
+from typing import Dict, Tuple
+import numpy as np
+from pokerrl_env.datatypes import StateActions, Street
+from pokerrl_env.tracing import traced
+
+LedgerSnapshot = namedtuple('LedgerSnapshot', ['per_street', 'total', 'street', 'num_rows'])
+
+
+class Ledger:
+    """ Running record of the amount each player has invested this street and in total.
+
+    Updated one global state row at a time, so stepping a hand costs O(1) per action
+    instead of replaying the whole history through return_investments. """
+    def __init__(self, config):
+        self.config = config
+        self.per_street = {position: 0 for position in config.player_positions}
+        self.total = {position: 0 for position in config.player_positions}
+        self.street = Street.PREFLOP
+        self.num_rows = 0
+
+    @classmethod
+    def from_states(cls, global_states: np.ndarray, config):
+        ledger = cls(config)
+        ledger.extend(global_states)
+        return ledger
+
+    def update(self, global_state: np.ndarray):
+        """ Apply a single global state row. Same rules as return_investments. """
+        gl = self.config.global_layout
+        previous_player = global_state[gl.previous_position]
+        if global_state[gl.street] > self.street:
+            # new street
+            self.per_street = {position: 0 for position in self.config.player_positions}
+            self.street = global_state[gl.street]
+        elif global_state[gl.previous_action] > StateActions.CALL and not global_state[gl.previous_bet_is_blind]:
+            # Special case for raise
+            raise_amount = global_state[gl.previous_amount] - self.per_street[previous_player]
+            self.total[previous_player] += raise_amount
+            self.per_street[previous_player] += raise_amount
+        else:
+            self.total[previous_player] += global_state[gl.previous_amount]
+            self.per_street[previous_player] += global_state[gl.previous_amount]
+        self.num_rows += 1
+
+    @traced('ledger')
+    def extend(self, global_states: np.ndarray):
+        for global_state in global_states:
+            self.update(global_state)
+
+    def investments(self) -> Tuple[Dict[int, float], Dict[int, float]]:
+        """ Returns copies of (per street, total) investments, in the same form as return_investments """
+        return dict(self.per_street), dict(self.total)
+
+    def snapshot(self) -> LedgerSnapshot:
+        return LedgerSnapshot(dict(self.per_street), dict(self.total), self.street, self.num_rows)
+
+    def restore(self, snapshot: LedgerSnapshot):
+        """ Back to a snapshot. The snapshot is copied, so it can be restored again """
+        self.per_street = dict(snapshot.per_street)
+        self.total = dict(snapshot.total)
+        self.street = snapshot.street
+        self.num_rows = snapshot.num_rows
+
+    def validate(self, global_states: np.ndarray):
+        """ Check the ledger against a full replay of the history """
+        from pokerrl_env.transition import return_investments
+        assert self.num_rows == global_states.shape[0], f"Ledger has seen {self.num_rows} rows, history has {global_states.shape[0]}"
+        per_street, total = return_investments(global_states, self.config)
+        assert per_street == self.per_street, f"Per street investments out of sync: ledger {self.per_street}, replay {per_street}"
+        assert total == self.total, f"Total investments out of sync: ledger {self.total}, replay {total}"
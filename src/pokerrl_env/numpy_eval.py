@@ -0,0 +1,195 @@
+from itertools import combinations
+import numpy as np
+
+# Pure NumPy version of the rusteval ranking, used by cardlib when the library isn't available.
+# Whole batches are ranked with table lookups, no per hand Python.
+# Cards are cactus kev encoded, as produced by cardlib.encode_cards. Rank 1 is a royal flush, 7462 the worst high card.
+
+PRIMES = np.array([2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41], dtype=np.int64)
+NUM_RANKS = 13
+
+# Straights from best to worst as bit patterns of the ranks in them, the wheel last
+STRAIGHTS = [0x1F00 >> i for i in range(9)] + [0x100F]
+
+
+def _build_tables():
+    """ Same tables as tables.rs. FLUSHES and UNIQUE5 are indexed by the 13 bit pattern of the ranks in the hand,
+    CARD_PRODUCTS (sorted) and PRODUCT_RANKS hold the hands with a paired rank by the product of their primes. """
+    flushes = np.zeros(1 << NUM_RANKS, dtype=np.int16)
+    unique5 = np.zeros(1 << NUM_RANKS, dtype=np.int16)
+    # Five distinct ranks, highest pattern first. Comparing the patterns as integers compares the cards high to low.
+    distinct = sorted((sum(1 << r for r in ranks) for ranks in combinations(range(NUM_RANKS), 5)), reverse=True)
+    others = [pattern for pattern in distinct if pattern not in STRAIGHTS]
+    for i, pattern in enumerate(STRAIGHTS):
+        flushes[pattern] = 1 + i
+        unique5[pattern] = 1600 + i
+    for i, pattern in enumerate(others):
+        flushes[pattern] = 323 + i
+        unique5[pattern] = 6186 + i
+
+    ranks_desc = list(range(NUM_RANKS - 1, -1, -1))
+    products = []
+
+    def add(counts):
+        product = 1
+        for rank, count in counts:
+            product *= int(PRIMES[rank]) ** count
+        products.append(product)
+
+    # four of a kind 11-166
+    for quad in ranks_desc:
+        for kicker in ranks_desc:
+            if kicker != quad:
+                add([(quad, 4), (kicker, 1)])
+    # full house 167-322
+    for trips in ranks_desc:
+        for pair in ranks_desc:
+            if pair != trips:
+                add([(trips, 3), (pair, 2)])
+    # three of a kind 1610-2467
+    trips_products = []
+    for trips in ranks_desc:
+        for kickers in combinations([r for r in ranks_desc if r != trips], 2):
+            trips_products.append(int(PRIMES[trips]) ** 3 * int(PRIMES[kickers[0]]) * int(PRIMES[kickers[1]]))
+    # two pair 2468-3325
+    two_pair_products = []
+    for high, low in combinations(ranks_desc, 2):
+        for kicker in ranks_desc:
+            if kicker not in (high, low):
+                two_pair_products.append(int(PRIMES[high]) ** 2 * int(PRIMES[low]) ** 2 * int(PRIMES[kicker]))
+    # one pair 3326-6185
+    pair_products = []
+    for pair in ranks_desc:
+        for kickers in combinations([r for r in ranks_desc if r != pair], 3):
+            pair_products.append(int(PRIMES[pair]) ** 2 * int(np.prod(PRIMES[list(kickers)])))
+
+    product_ranks = {}
+    for start, group in ((11, products), (1610, trips_products), (2468, two_pair_products), (3326, pair_products)):
+        for i, product in enumerate(group):
+            product_ranks[product] = start + i
+    card_products = np.array(sorted(product_ranks), dtype=np.int64)
+    ranks = np.array([product_ranks[product] for product in card_products], dtype=np.int16)
+    for table in (flushes, unique5, card_products, ranks):
+        table.setflags(write=False)
+    return flushes, unique5, card_products, ranks
+
+
+FLUSHES, UNIQUE5, CARD_PRODUCTS, PRODUCT_RANKS = _build_tables()
+
+# Ranks of 5 distinct ranks, indexed by the 13 rank bits, plus 8192 when the cards are suited
+DISTINCT_RANKS = np.concatenate([UNIQUE5, FLUSHES])
+DISTINCT_RANKS.setflags(write=False)
+
+# Paired hands are found by prime product in a perfect hash (hash and displace): the bucket hash picks a
+# displacement that is xored into the slot hash, chosen so that the 4888 products land in distinct slots.
+BUCKET_BITS = 11
+SLOT_BITS = 14
+BUCKET_MULTIPLIER = np.uint32(0x9E3779B1)
+SLOT_MULTIPLIER = np.uint32(0x85EBCA6B)
+
+
+# The hashes wrap around 32 bits on purpose. numpy only warns about that for scalars, i.e. when ranking a single hand
+def _bucket(products):
+    with np.errstate(over='ignore'):
+        return (products * BUCKET_MULTIPLIER) >> np.uint32(32 - BUCKET_BITS)
+
+
+def _slot(products):
+    with np.errstate(over='ignore'):
+        return (products * SLOT_MULTIPLIER) >> np.uint32(32 - SLOT_BITS)
+
+
+def _build_product_hash():
+    products = CARD_PRODUCTS.astype(np.uint32)
+    buckets = _bucket(products)
+    slots = _slot(products)
+    displacements = np.zeros(1 << BUCKET_BITS, dtype=np.uint32)
+    ranks = np.zeros(1 << SLOT_BITS, dtype=np.int16)
+    used = np.zeros(1 << SLOT_BITS, dtype=bool)
+    # largest buckets first, while there is the most room
+    for bucket in np.argsort(-np.bincount(buckets, minlength=1 << BUCKET_BITS), kind='stable'):
+        members = np.flatnonzero(buckets == bucket)
+        if members.size == 0:
+            break
+        for displacement in range(1 << SLOT_BITS):
+            candidate = slots[members] ^ np.uint32(displacement)
+            if not used[candidate].any() and np.unique(candidate).size == candidate.size:
+                used[candidate] = True
+                ranks[candidate] = PRODUCT_RANKS[members]
+                displacements[bucket] = displacement
+                break
+        else:
+            raise RuntimeError("No displacement places every product, change the hash multipliers")
+    displacements.setflags(write=False)
+    ranks.setflags(write=False)
+    return displacements, ranks
+
+
+DISPLACEMENTS, HASHED_PRODUCT_RANKS = _build_product_hash()
+
+# Hands per chunk. Keeps the (chunk, combinations) intermediates in cache, so throughput doesn't drop on large batches.
+CHUNK_SIZE = 1024
+
+HAND_PAIRS = np.array(list(combinations(range(4), 2)))
+BOARD_TRIPLES = np.array(list(combinations(range(5), 3)))
+HOLDEM_COMBOS = np.array(list(combinations(range(7), 5)))
+
+
+def _combine(bits, suits, products):
+    """ Rank from the OR of the cards, the AND of their suit bits and the product of their primes. Same result as rank.rs """
+    ranks = DISTINCT_RANKS[(bits >> 16) | ((suits & 0xF000) != 0).astype(np.uint32) << 13]
+    paired = HASHED_PRODUCT_RANKS[_slot(products) ^ DISPLACEMENTS[_bucket(products)]]
+    return np.where(ranks == 0, paired, ranks)
+
+
+def _as_cards(cards):
+    return np.asarray(cards).astype(np.uint32)
+
+
+def rank(cards) -> np.ndarray:
+    """ Ranks of 5 card hands, cards (..., 5) """
+    cards = _as_cards(cards)
+    bits = np.bitwise_or.reduce(cards, axis=-1)
+    suits = np.bitwise_and.reduce(cards, axis=-1)
+    products = np.prod(cards & 0xFF, axis=-1, dtype=np.uint32)
+    return _combine(bits, suits, products).astype(np.intc)
+
+
+def _omaha_chunk(hands, boards):
+    # Like lookup.rs, summarise the 6 hand pairs and 10 board triples once and combine them, instead of ranking 60 x 5 cards
+    pairs = hands[:, HAND_PAIRS]
+    triples = boards[:, BOARD_TRIPLES]
+    pair_bits = pairs[..., 0] | pairs[..., 1]
+    pair_suits = pairs[..., 0] & pairs[..., 1]
+    pair_products = (pairs[..., 0] & 0xFF) * (pairs[..., 1] & 0xFF)
+    triple_bits = triples[..., 0] | triples[..., 1] | triples[..., 2]
+    triple_suits = triples[..., 0] & triples[..., 1] & triples[..., 2]
+    triple_products = (triples[..., 0] & 0xFF) * (triples[..., 1] & 0xFF) * (triples[..., 2] & 0xFF)
+    ranks = _combine(pair_bits[:, :, None] | triple_bits[:, None, :],
+                     pair_suits[:, :, None] & triple_suits[:, None, :],
+                     pair_products[:, :, None] * triple_products[:, None, :])
+    return ranks.reshape(ranks.shape[0], -1).min(axis=1)
+
+
+def _holdem_chunk(hands, boards):
+    cards = np.concatenate([hands, boards], axis=1)
+    return rank(cards[:, HOLDEM_COMBOS]).min(axis=1)
+
+
+def _best_rank(rank_chunk, hands, boards):
+    hands = _as_cards(hands)
+    boards = np.broadcast_to(_as_cards(boards), (hands.shape[0], 5))
+    ranks = np.empty(hands.shape[0], dtype=np.intc)
+    for start in range(0, hands.shape[0], CHUNK_SIZE):
+        ranks[start:start + CHUNK_SIZE] = rank_chunk(hands[start:start + CHUNK_SIZE], boards[start:start + CHUNK_SIZE])
+    return ranks
+
+
+def hand_rank_batch(hands, boards) -> np.ndarray:
+    """ Best of the 60 Omaha combinations of each (M,4) hand with its (M,5) or shared (5,) board """
+    return _best_rank(_omaha_chunk, hands, boards)
+
+
+def holdem_hand_rank_batch(hands, boards) -> np.ndarray:
+    """ Best of the 21 five card combinations of each (M,2) hand with its board """
+    return _best_rank(_holdem_chunk, hands, boards)
@@ -5,8 +5,9 @@ from pokerrl_env.view import player_view, human_readable_view
 from pokerrl_env.transition import step_state,init_state
 
 def get_action(action_mask,global_states,config):
+    gl = config.global_layout
     readable_actions = ['FOLD','CHECK','CALL']
-    if global_states[-1,config.global_state_mapping['last_agro_action']] > StateActions.CALL:
+    if global_states[-1,gl.last_agro_action] > StateActions.CALL:
         agro_action = 'RAISE'
     else:
         agro_action = 'BET'
@@ -24,13 +25,14 @@ def get_action(action_mask,global_states,config):
 
 def play_game():
     config = Config(num_players=2)
+    gl = config.global_layout
     global_state,done,winnings,action_mask = init_state(config)
     while not done:
         player_idx = return_current_player(global_state)
         human_readable_view(global_state,player_idx, config,display=True)
         action = get_action(action_mask,global_state,config)
         global_state,done,winnings,action_mask = step_state(global_state, action, config)
-    human_readable_view(global_state,global_state[-1,config.global_state_mapping['current_player']], config,display=True)
+    human_readable_view(global_state,global_state[-1,gl.current_player], config,display=True)
     print('winnings',winnings)
 
 if __name__ == "__main__":
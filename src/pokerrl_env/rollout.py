@@ -0,0 +1,154 @@
+import traceback
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import numpy as np
+from pokerrl_env.config import Config
+from pokerrl_env.vec_game import VecGame
+
+
+def random_policy(observations, action_masks):
+    """ Uniform over the legal actions of every table """
+    return np.argmax(np.random.random(action_masks.shape) * action_masks, axis=1)
+
+
+def return_trajectory_specs(config: Config, num_tables: int, num_steps: int):
+    """ name -> (shape, dtype) of every trajectory buffer. Indexed [step, table, ...] """
+    return {
+        "observations": ((num_steps, num_tables, config.player_state_shape), np.float64),
+        "action_masks": ((num_steps, num_tables, config.num_actions), np.int8),
+        "current_players": ((num_steps, num_tables), np.int8),
+        "actions": ((num_steps, num_tables), np.int64),
+        "rewards": ((num_steps, num_tables, config.num_players), np.float64),
+        "dones": ((num_steps, num_tables), np.bool_),
+    }
+
+
+def attach_trajectories(names, specs):
+    """ Opens the shared memory blocks by name. Returns (blocks, arrays) """
+    blocks = {key: shared_memory.SharedMemory(name=names[key]) for key in specs}
+    arrays = {key: np.ndarray(shape, dtype=dtype, buffer=blocks[key].buf) for key, (shape, dtype) in specs.items()}
+    return blocks, arrays
+
+
+def rollout_worker(config, table_range, num_steps, policy, seed, names, specs, conn):
+    """ Runs tables[start:end] on a VecGame and writes num_steps of trajectories into the shared buffers per collect command """
+    blocks, arrays = attach_trajectories(names, specs)
+    start, end = table_range
+    try:
+        # Forked workers inherit the parent's random state, so every worker's policy would sample the same actions without this
+        np.random.seed([seed, start])
+        # Table i deals from stream i of the seed, however the tables are split across workers
+        vec_game = VecGame(config, end - start, seed=seed, streams=range(start, end))
+        observations, action_masks = vec_game.reset()
+        while conn.recv() == "collect":
+            try:
+                for step in range(num_steps):
+                    arrays["observations"][step, start:end] = observations
+                    arrays["action_masks"][step, start:end] = action_masks
+                    arrays["current_players"][step, start:end] = vec_game.current_players
+                    actions = policy(observations, action_masks)
+                    arrays["actions"][step, start:end] = actions
+                    observations, action_masks, rewards, dones = vec_game.step(actions)
+                    arrays["rewards"][step, start:end] = rewards
+                    arrays["dones"][step, start:end] = dones
+                conn.send(None)
+            except Exception:
+                conn.send(traceback.format_exc())
+    finally:
+        del arrays
+        for block in blocks.values():
+            block.close()
+
+
+class RolloutEngine:
+    """ Self play across worker processes, with trajectories written to shared memory.
+
+    num_tables tables are split evenly across num_workers processes. Each worker plays its tables on a
+    VecGame, asking policy(observations, action_masks) for one action per table every step.
+    collect() runs num_steps steps on every table and returns the trajectory buffers as a dict of arrays
+    indexed [step, table, ...] (see return_trajectory_specs). The arrays are views of the shared memory,
+    so reading them copies nothing; they are overwritten by the next collect. Tables that finish a hand
+    are reset, so a table's steps can span hands; dones marks the last step of each hand and rewards holds
+    its results.
+
+    Table i deals from stream i of a Dealer seeded with seed, so the cards don't depend on how the tables are split.
+
+    The policy is called inside the workers, so it must be picklable when processes are spawned rather than forked. """
+    def __init__(self, config: Config, num_tables: int, num_workers: int, num_steps: int, policy=random_policy, seed=0):
+        assert 0 < num_workers <= num_tables, "Need at least one table per worker"
+        self.config = config
+        self.num_tables = num_tables
+        self.num_workers = num_workers
+        self.num_steps = num_steps
+        self.specs = return_trajectory_specs(config, num_tables, num_steps)
+        self.blocks = {}
+        for key, (shape, dtype) in self.specs.items():
+            self.blocks[key] = shared_memory.SharedMemory(create=True, size=max(1, int(np.prod(shape)) * np.dtype(dtype).itemsize))
+        self.trajectories = {key: np.ndarray(shape, dtype=dtype, buffer=self.blocks[key].buf) for key, (shape, dtype) in self.specs.items()}
+        names = {key: block.name for key, block in self.blocks.items()}
+        bounds = np.linspace(0, num_tables, num_workers + 1).astype(int)
+        self.connections = []
+        self.workers = []
+        for worker in range(num_workers):
+            parent_conn, child_conn = mp.Pipe()
+            process = mp.Process(target=rollout_worker,
+                                 args=(config, (bounds[worker], bounds[worker + 1]), num_steps, policy, seed, names, self.specs, child_conn),
+                                 daemon=True)
+            process.start()
+            # Only the worker holds the child end, so recv sees EOF instead of blocking if the worker dies
+            child_conn.close()
+            self.connections.append(parent_conn)
+            self.workers.append(process)
+
+    def collect(self):
+        """ Runs num_steps steps on every table. Returns the shared trajectory arrays """
+        for worker, conn in enumerate(self.connections):
+            try:
+                conn.send("collect")
+            except (BrokenPipeError, ConnectionResetError):
+                raise self._worker_died(worker) from None
+        errors = []
+        for worker, conn in enumerate(self.connections):
+            try:
+                errors.append(conn.recv())
+            except (EOFError, ConnectionResetError):
+                raise self._worker_died(worker) from None
+        errors = [error for error in errors if error is not None]
+        if errors:
+            raise RuntimeError(f"Rollout worker failed:\n{errors[0]}")
+        return self.trajectories
+
+    def _worker_died(self, worker):
+        process = self.workers[worker]
+        process.join(timeout=1)
+        return RuntimeError(f"Rollout worker {worker} died (exit code {process.exitcode})")
+
+    def close(self):
+        """ Stops the workers, terminating any that don't exit, and frees the shared memory """
+        try:
+            for conn, process in zip(self.connections, self.workers):
+                if process.is_alive():
+                    try:
+                        conn.send("close")
+                    except (BrokenPipeError, ConnectionResetError):
+                        pass
+            for conn, process in zip(self.connections, self.workers):
+                process.join(timeout=5)
+                if process.is_alive():
+                    process.terminate()
+                    process.join()
+                conn.close()
+        finally:
+            self.connections = []
+            self.workers = []
+            self.trajectories = {}
+            for block in self.blocks.values():
+                block.close()
+                block.unlink()
+            self.blocks = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,358 @@
+""" Asyncio game server hosting many tables, and a load generator to measure it.
+
+Clients speak newline delimited JSON over TCP or a unix socket. Every request carries an id, echoed in its response.
+One connection can hold any number of tables.
+
+    {"id": 1, "type": "open"}                          -> {"id": 1, "table": 7, "game_states": [...], "done": false, "winnings": null, "action_mask": [...]}
+    {"id": 2, "type": "step", "table": 7, "action": 2}  -> {"id": 2, "table": 7, ...}
+    {"id": 3, "type": "reset", "table": 7}              -> {"id": 3, "table": 7, ...}  deals the next hand
+    {"id": 4, "type": "close", "table": 7}              -> {"id": 4, "table": 7, "closed": true}
+
+Tables opened with {"type": "open", "delta": true, "seat": 1} send the full view only at open, reset and sync
+({"type": "sync", "table": 7}), and otherwise just the rows added since the previous state, with seq and start (see Game).
+Their rows are all seen by seat, the first seat if it is left out.
+
+Failed requests get {"id": ..., "error": "..."}. A table that doesn't act within action_timeout seconds checks, or folds
+if it can't check, and the state is pushed to its connection as {"table": 7, "timeout": true, ...} with no id.
+
+python -m pokerrl_env.server serve --port 8765 --num-players 6
+python -m pokerrl_env.server load --port 8765 --tables 2000 --connections 8 --seconds 10 """
+import argparse
+import asyncio
+import heapq
+import json
+import random
+import time
+import numpy as np
+from pokerrl_env.config import Config
+from pokerrl_env.datatypes import ModelActions
+from pokerrl_env.game import Game
+
+
+def _to_json(value):
+    """ numpy scalars and arrays left in game dicts """
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    return value.item()
+
+
+def encode_messages(messages) -> bytes:
+    """ One buffer holding a JSON line per message """
+    return b''.join(json.dumps(message, default=_to_json, separators=(',', ':')).encode() + b'\n' for message in messages)
+
+
+class Connection:
+    """ A client connection. Responses wait in a bounded queue that one writer task drains in batches. """
+    def __init__(self, reader, writer, queue_size):
+        self.reader = reader
+        self.writer = writer
+        self.outbound = asyncio.Queue(maxsize=queue_size)
+        self.tables = set()
+        self.closed = False
+
+
+class Table:
+    def __init__(self, game: Game, connection: Connection):
+        self.game = game
+        self.connection = connection
+        # Bumped on every state sent, so stale entries in the deadline heap are skipped
+        self.turn = 0
+
+
+class GameServer:
+    """ Hosts tables of config, which must have is_server set so Game returns JSON ready dicts.
+
+    - action_timeout: seconds a table has to act before the server checks or folds for it. None disables deadlines.
+    - max_tables: tables open at once across all connections. Opening more is refused.
+    - queue_size: responses buffered per connection. When a client stops reading, its requests stop being read too,
+      and a timeout push to a full queue closes the connection.
+    - batch_size: most responses encoded and written together. """
+    def __init__(self, config: Config, action_timeout=30.0, max_tables=10_000, queue_size=1024, batch_size=64):
+        assert config.is_server, "The server needs Config(is_server=True)"
+        self.config = config
+        self.action_timeout = action_timeout
+        self.max_tables = max_tables
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.tables = {}
+        self.connections = {}
+        self.next_table = 0
+        self.deadlines = []
+        self.timeouts = 0
+        self.server = None
+        self.deadline_task = None
+
+    async def start(self, host='127.0.0.1', port=0, path=None):
+        """ Listen on host:port, or on the unix socket path. Returns the asyncio server """
+        if path is None:
+            self.server = await asyncio.start_server(self.handle_connection, host, port)
+        else:
+            self.server = await asyncio.start_unix_server(self.handle_connection, path)
+        if self.action_timeout is not None:
+            self.deadline_task = asyncio.create_task(self._expire_deadlines())
+        return self.server
+
+    @property
+    def port(self):
+        return self.server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        """ Stop listening, close every connection and wait for their handlers to finish """
+        if self.deadline_task is not None:
+            self.deadline_task.cancel()
+        self.server.close()
+        for connection in self.connections:
+            connection.writer.close()
+        await asyncio.gather(*self.connections.values(), return_exceptions=True)
+        await self.server.wait_closed()
+
+    async def handle_connection(self, reader, writer):
+        connection = Connection(reader, writer, self.queue_size)
+        self.connections[connection] = asyncio.current_task()
+        write_task = asyncio.create_task(self._write_loop(connection))
+        try:
+            while not connection.closed:
+                line = await reader.readline()
+                if not line:
+                    break
+                message = None
+                try:
+                    message = json.loads(line)
+                    response = self.handle(message, connection)
+                except Exception as error:
+                    response = {'id': message.get('id') if isinstance(message, dict) else None, 'error': str(error)}
+                await connection.outbound.put(response)
+        except ConnectionError:
+            pass
+        finally:
+            connection.closed = True
+            for table_id in list(connection.tables):
+                self.tables.pop(table_id, None)
+            if not write_task.done():
+                await connection.outbound.put(None)
+                await write_task
+            writer.close()
+            del self.connections[connection]
+
+    def handle(self, message: dict, connection: Connection) -> dict:
+        """ Response to one request """
+        kind = message.get('type')
+        if kind == 'open':
+            if len(self.tables) >= self.max_tables:
+                raise ValueError(f"Server is full ({self.max_tables} tables)")
+            table_id = self.next_table
+            self.next_table += 1
+            table = self.tables[table_id] = Table(Game(self.config, delta=bool(message.get('delta')), seat=message.get('seat')), connection)
+            connection.tables.add(table_id)
+            return self._state(message, table_id, table, table.game.reset())
+        table_id = message.get('table')
+        table = self.tables.get(table_id)
+        if table is None or table.connection is not connection:
+            raise ValueError(f"No table {table_id} on this connection")
+        if kind == 'step':
+            action = int(message['action'])
+            if table.game.done or not 0 <= action < self.config.num_actions or not table.game.action_mask[action]:
+                raise ValueError(f"Action {action} is not legal")
+            return self._state(message, table_id, table, table.game.step(action))
+        if kind == 'reset':
+            return self._state(message, table_id, table, table.game.reset())
+        if kind == 'sync':
+            return self._state(message, table_id, table, table.game.sync())
+        if kind == 'close':
+            del self.tables[table_id]
+            connection.tables.discard(table_id)
+            return {'id': message.get('id'), 'table': table_id, 'closed': True}
+        raise ValueError(f"Unknown request type {kind}")
+
+    def _state(self, message, table_id, table, state):
+        table.turn += 1
+        # A hand can be left undone with no legal action (everyone all in), there is nothing to time out then
+        if self.action_timeout is not None and not state['done'] and any(state['action_mask']):
+            heapq.heappush(self.deadlines, (time.monotonic() + self.action_timeout, table_id, table.turn))
+        return {'id': message.get('id'), 'table': table_id, **state}
+
+    async def _expire_deadlines(self):
+        interval = min(self.action_timeout / 4, 0.1)
+        while True:
+            await asyncio.sleep(interval)
+            now = time.monotonic()
+            while self.deadlines and self.deadlines[0][0] <= now:
+                _, table_id, turn = heapq.heappop(self.deadlines)
+                table = self.tables.get(table_id)
+                if table is None or table.turn != turn or table.game.done:
+                    continue
+                mask = table.game.action_mask
+                action = ModelActions.CHECK if mask[ModelActions.CHECK] else ModelActions.FOLD
+                if not mask[action]:
+                    continue
+                try:
+                    push = self._state({}, table_id, table, table.game.step(action))
+                except Exception as error:
+                    push = {'error': f"Timeout action failed: {error}"}
+                self.timeouts += 1
+                push.pop('id', None)
+                push.update(table=table_id, timeout=True)
+                try:
+                    table.connection.outbound.put_nowait(push)
+                except asyncio.QueueFull:
+                    table.connection.closed = True
+                    table.connection.writer.close()
+
+    async def _write_loop(self, connection: Connection):
+        try:
+            while True:
+                batch = [await connection.outbound.get()]
+                while len(batch) < self.batch_size and not connection.outbound.empty():
+                    batch.append(connection.outbound.get_nowait())
+                stop = None in batch
+                connection.writer.write(encode_messages(message for message in batch if message is not None))
+                await connection.writer.drain()
+                if stop:
+                    return
+        except ConnectionError:
+            connection.closed = True
+
+
+class GameClient:
+    """ Client for GameServer. Requests are pipelined: many can be in flight on one connection, matched to responses by id.
+    Timeout pushes from the server are put on the pushes queue. """
+    def __init__(self):
+        self.reader = None
+        self.writer = None
+        self.pending = {}
+        self.next_id = 0
+        self.pushes = asyncio.Queue()
+        self.read_task = None
+
+    async def connect(self, host='127.0.0.1', port=8765, path=None):
+        if path is None:
+            self.reader, self.writer = await asyncio.open_connection(host, port)
+        else:
+            self.reader, self.writer = await asyncio.open_unix_connection(path)
+        self.read_task = asyncio.create_task(self._read_loop())
+        return self
+
+    async def _read_loop(self):
+        while True:
+            line = await self.reader.readline()
+            if not line:
+                break
+            message = json.loads(line)
+            future = self.pending.pop(message.get('id'), None)
+            if future is None:
+                await self.pushes.put(message)
+            else:
+                future.set_result(message)
+        for future in self.pending.values():
+            future.set_exception(ConnectionError("Server closed the connection"))
+        self.pending = {}
+
+    async def request(self, message: dict) -> dict:
+        message_id = self.next_id
+        self.next_id += 1
+        future = asyncio.get_running_loop().create_future()
+        self.pending[message_id] = future
+        self.writer.write(encode_messages([{'id': message_id, **message}]))
+        await self.writer.drain()
+        return await future
+
+    async def open_table(self, delta=False, seat=None):
+        return await self.request({'type': 'open', 'delta': delta, 'seat': seat})
+
+    async def step(self, table, action):
+        return await self.request({'type': 'step', 'table': table, 'action': int(action)})
+
+    async def reset(self, table):
+        return await self.request({'type': 'reset', 'table': table})
+
+    async def sync(self, table):
+        return await self.request({'type': 'sync', 'table': table})
+
+    async def close_table(self, table):
+        return await self.request({'type': 'close', 'table': table})
+
+    async def close(self):
+        self.writer.close()
+        if self.read_task is not None:
+            await self.read_task
+
+
+async def run_load(host='127.0.0.1', port=8765, path=None, num_tables=1000, num_connections=8, seconds=10.0, seed=0, delta=True):
+    """ Plays random legal actions on num_tables tables spread over num_connections connections for seconds.
+    Returns tables opened per second, hands and actions per second, action latency percentiles in milliseconds
+    and mean bytes per step response. delta opens the tables in delta mode. """
+    rng = random.Random(seed)
+    clients = [await GameClient().connect(host, port, path) for _ in range(num_connections)]
+    start = time.perf_counter()
+    opened = await asyncio.gather(*(clients[i % num_connections].open_table(delta) for i in range(num_tables)))
+    open_seconds = time.perf_counter() - start
+    latencies = []
+    hands = 0
+    response_bytes = 0
+    stop_at = time.perf_counter() + seconds
+
+    async def play(client, state):
+        nonlocal hands, response_bytes
+        table = state['table']
+        while time.perf_counter() < stop_at:
+            if state.get('error'):
+                raise RuntimeError(state['error'])
+            if state['done'] or not any(state['action_mask']):
+                hands += 1
+                state = await client.reset(table)
+                continue
+            action = rng.choice([action for action, legal in enumerate(state['action_mask']) if legal])
+            tic = time.perf_counter()
+            state = await client.step(table, action)
+            latencies.append(time.perf_counter() - tic)
+            response_bytes += len(encode_messages([state]))
+
+    play_start = time.perf_counter()
+    await asyncio.gather(*(play(clients[i % num_connections], state) for i, state in enumerate(opened)))
+    elapsed = time.perf_counter() - play_start
+    for client in clients:
+        await client.close()
+    latencies_ms = 1000 * np.array(latencies or [0.0])
+    return {
+        'tables': num_tables,
+        'tables_opened_per_sec': num_tables / open_seconds,
+        'hands_per_sec': hands / elapsed,
+        'actions_per_sec': len(latencies) / elapsed,
+        'p50_action_ms': float(np.percentile(latencies_ms, 50)),
+        'p99_action_ms': float(np.percentile(latencies_ms, 99)),
+        'bytes_per_step': response_bytes / max(len(latencies), 1),
+    }
+
+
+async def _serve(args):
+    config = Config(num_players=args.num_players, is_server=True)
+    server = GameServer(config, action_timeout=args.action_timeout, max_tables=args.max_tables)
+    await server.start(args.host, args.port, args.path)
+    print(f"Serving {args.num_players} player tables on {args.path or f'{args.host}:{server.port}'}")
+    async with server.server:
+        await server.server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m pokerrl_env.server')
+    parser.add_argument('command', choices=['serve', 'load'])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--path', help='unix socket path instead of host and port')
+    parser.add_argument('--num-players', type=int, default=2)
+    parser.add_argument('--action-timeout', type=float, default=30.0)
+    parser.add_argument('--max-tables', type=int, default=10_000)
+    parser.add_argument('--tables', type=int, default=1000, help='load: tables to play')
+    parser.add_argument('--connections', type=int, default=8, help='load: client connections')
+    parser.add_argument('--seconds', type=float, default=10.0, help='load: how long to play')
+    parser.add_argument('--full-views', action='store_true', help='load: send the whole hand every step instead of deltas')
+    args = parser.parse_args(argv)
+    if args.command == 'serve':
+        asyncio.run(_serve(args))
+    else:
+        results = asyncio.run(run_load(args.host, args.port, args.path, args.tables, args.connections, args.seconds, delta=not args.full_views))
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
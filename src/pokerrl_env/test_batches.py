@@ -0,0 +1,59 @@
+import random
+import numpy as np
+from pokerrl_env.config import Config
+from pokerrl_env.batches import BatchGenerator
+from pokerrl_env.rollout import random_policy
+from pokerrl_env.vec_game import VecGame
+
+
+def reference_decisions(config, num_hands):
+    """ Decisions of the first num_hands hands on one table, collected step by step """
+    vec_game = VecGame(config, 1)
+    observations, action_masks = vec_game.reset()
+    decisions, hand = [], []
+    while len(decisions) < num_hands:
+        actions = random_policy(observations, action_masks)
+        hand.append((observations[0].copy(), int(actions[0]), int(vec_game.current_players[0])))
+        observations, action_masks, rewards, dones = vec_game.step(actions)
+        if dones[0]:
+            if not vec_game.truncated[0]:
+                results = dict(zip(config.player_positions, rewards[0]))
+                decisions.append([(observation, action, player, results[player]) for observation, action, player in hand])
+            hand = []
+    return [decision for hand in decisions for decision in hand]
+
+
+def test_batches_match_step_by_step_play():
+    config = Config(num_players=3)
+    random.seed(1)
+    np.random.seed(1)
+    expected = reference_decisions(config, 12)
+    random.seed(1)
+    np.random.seed(1)
+    generator = BatchGenerator(config, batch_size=16, num_tables=1, num_hands=12)
+    batches = [{key: array.copy() for key, array in batch.items()} for batch in generator]
+    rows = {key: np.concatenate([batch[key] for batch in batches]) for key in batches[0]}
+    assert all(batch["actions"].shape == (16,) for batch in batches)
+    assert rows["valid"].sum() == len(expected)
+    assert not rows["valid"][len(expected):].any()
+    assert np.all(rows["observations"][len(expected):] == 0)
+    for i, (observation, action, player, reward) in enumerate(expected):
+        assert np.array_equal(rows["observations"][i], observation)
+        assert rows["actions"][i] == action
+        assert rows["players"][i] == player
+        assert rows["rewards"][i] == reward
+    assert rows["dones"].sum() == 12
+
+
+def test_batches_reuse_preallocated_buffers():
+    config = Config(num_players=6)
+    generator = BatchGenerator(config, batch_size=32, num_tables=8, num_buffers=3)
+    seen = []
+    for i, batch in enumerate(generator):
+        assert batch["valid"].all()
+        assert np.all(np.take_along_axis(batch["action_masks"], batch["actions"][:, None], axis=1) == 1)
+        seen.append(id(batch["observations"]))
+        if i == 8:
+            break
+    assert len(set(seen)) == 3
+    assert seen[:3] == seen[3:6]
@@ -0,0 +1,131 @@
+import numpy as np
+import pytest
+import ctypes
+from pokerrl_env.cardlib import load_library, get_backend, encode, encode_cards, decode_cards, hand_rank, holdem_hand_rank, hand_rank_batch, holdem_hand_rank_batch, compare_evaluators, set_evaluator, get_evaluator, equity, winner, holdem_winner
+
+
+def rust_available():
+    try:
+        load_library()
+    except OSError:
+        return False
+    return True
+
+requires_rust = pytest.mark.skipif(not rust_available() or get_backend() != 'rust', reason="librusteval isn't built or isn't the backend")
+
+
+def random_deals(num_deals, num_cards, seed=0):
+    rng = np.random.default_rng(seed)
+    deck = np.array([encode([rank, suit]) for rank in range(1, 14) for suit in range(1, 5)])
+    return deck[np.argsort(rng.random((num_deals, 52)), axis=1)[:, :num_cards]]
+
+
+def test_hand_rank_batch_matches_hand_rank():
+    cards = random_deals(500, 9)
+    hands, boards = cards[:, :4], cards[:, 4:]
+    ranks = hand_rank_batch(hands, boards)
+    assert ranks.shape == (500,)
+    assert list(ranks) == [hand_rank(list(hand), list(board)) for hand, board in zip(hands, boards)]
+
+
+def test_holdem_hand_rank_batch_matches_holdem_hand_rank():
+    cards = random_deals(500, 7)
+    hands, boards = cards[:, :2], cards[:, 2:]
+    ranks = holdem_hand_rank_batch(hands, boards)
+    assert list(ranks) == [holdem_hand_rank(list(hand), list(board)) for hand, board in zip(hands, boards)]
+
+
+def test_hand_rank_batch_shared_board():
+    cards = random_deals(1, 29)[0]
+    hands, board = cards[:24].reshape(6, 4), cards[24:]
+    assert list(hand_rank_batch(hands, board)) == [hand_rank(list(hand), list(board)) for hand in hands]
+
+
+@requires_rust
+def test_encoding_table_matches_rust_encode():
+    for rank in range(1, 14):
+        for suit in range(1, 5):
+            assert encode([rank, suit]) == load_library().encode(ctypes.c_byte(rank - 1), ctypes.c_byte(suit - 1))
+
+
+def test_encode_cards_round_trip():
+    cards = np.array([[13, 1, 2, 4, 0, 0], [1, 2, 7, 3, 12, 4]])
+    encoded = encode_cards(cards)
+    assert encoded.shape == (2, 3)
+    assert encoded[0, 2] == 0
+    assert encoded[1, 1] == encode([7, 3])
+    assert np.array_equal(decode_cards(encoded), cards)
+
+
+@requires_rust
+def test_evaluators_agree():
+    result = compare_evaluators(num_hands=200_000)
+    assert result['mismatches'] == 0
+
+
+def test_set_evaluator():
+    previous = get_evaluator()
+    set_evaluator('combos')
+    assert get_evaluator() == 'combos'
+    set_evaluator(previous)
+
+
+@requires_rust
+def test_equity_river_is_showdown():
+    cards = random_deals(50, 13, seed=1)
+    for deal in cards:
+        hand1, hand2, board = deal[:4], deal[4:8], deal[8:]
+        expected = {1: [1, 0], -1: [0, 1], 0: [0.5, 0.5]}[winner(list(hand1), list(hand2), list(board))]
+        assert list(equity([hand1, hand2], board)) == expected
+
+
+@requires_rust
+def test_equity_turn_exhaustive_holdem():
+    deal = random_deals(1, 10, seed=2)[0]
+    hands, board = deal[:6].reshape(3, 2), deal[6:]
+    expected = np.zeros(3)
+    for river in set(random_deals(1, 52)[0]) - set(deal):
+        ranks = holdem_hand_rank_batch(hands, np.append(board, river))
+        expected[ranks == ranks.min()] += 1 / np.count_nonzero(ranks == ranks.min())
+    result = equity(hands, board, num_threads=3)
+    assert np.allclose(result, expected / 42)
+
+
+@requires_rust
+def test_equity_monte_carlo_seeded():
+    deal = random_deals(1, 15, seed=3)[0]
+    hands, dead = deal[:12].reshape(3, 4), deal[12:]
+    first = equity(hands, dead=dead, iterations=20_000, seed=7, num_threads=4)
+    assert np.array_equal(first, equity(hands, dead=dead, iterations=20_000, seed=7, num_threads=4))
+    assert np.isclose(first.sum(), 1)
+    # the thread count doesn't change the boards drawn
+    for num_threads in (1, 3, None):
+        assert np.array_equal(first, equity(hands, dead=dead, iterations=20_000, seed=7, num_threads=num_threads))
+
+
+@requires_rust
+def test_equity_monte_carlo_converges_to_exhaustive():
+    for seed in range(3):
+        deal = random_deals(1, 11, seed=seed)[0]
+        hands, board = deal[:8].reshape(2, 4), deal[8:]
+        exact = equity(hands, board, iterations=0)
+        estimate = equity(hands, board, iterations=200_000, seed=seed)
+        # standard error is below 0.0012 at 200k boards
+        assert np.allclose(estimate, exact, atol=0.006)
+
+
+@requires_rust
+def test_equity_rejects_duplicate_cards():
+    deal = random_deals(1, 8)[0]
+    with pytest.raises(ValueError):
+        equity([deal[:4], deal[3:7]])
+
+
+@requires_rust
+def test_equity_rejects_too_many_dead_cards():
+    deal = random_deals(1, 52, seed=4)[0]
+    hands, dead = deal[:24].reshape(6, 4), deal[24:50]
+    # 2 cards are left for a 5 card board
+    for iterations in (1000, 0):
+        with pytest.raises(ValueError):
+            equity(hands, dead=dead, iterations=iterations)
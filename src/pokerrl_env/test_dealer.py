@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+from pokerrl_env.config import Config
+from pokerrl_env.dealer import CARDS, Dealer, write_cards
+from pokerrl_env.datatypes import GameTypes
+from pokerrl_env.game import Game
+from pokerrl_env.transition import init_state
+from pokerrl_env.vec_game import VecGame
+
+
+@pytest.mark.parametrize("game_type", [GameTypes.OMAHA_HI, GameTypes.HOLDEM])
+def test_hands_replay_from_seed(game_type):
+    config = Config(game_type=game_type, num_players=6)
+    dealer = Dealer(config, seed=11, streams=3, block_size=16)
+    for stream in range(3):
+        for expected_index in range(40):
+            hand_index, cards = dealer.next_hand(stream)
+            assert hand_index == expected_index
+            assert len(set(cards)) == cards.size == 6 * config.hole_cards + 5
+            assert np.array_equal(dealer.replay(stream, hand_index), cards)
+    # a worker holding streams 1 and 2 deals the same hands as a dealer holding all of them
+    worker = Dealer(config, seed=11, streams=range(1, 3))
+    assert np.array_equal(worker.deal(5, stream=1), Dealer(config, seed=11, streams=3).deal(5, stream=2))
+    assert not np.array_equal(worker.deal(5, stream=0), worker.deal(5, stream=1))
+
+
+def test_cards_are_uniform():
+    config = Config(num_players=2)
+    cards = Dealer(config, seed=0).deal(52_000)
+    for column in (0, cards.shape[1] - 1):
+        counts = np.bincount(cards[:, column], minlength=52)
+        assert counts.min() > 850 and counts.max() < 1150
+
+
+def test_dealt_cards_fill_hand_and_board_columns():
+    config = Config(num_players=3)
+    dealer = Dealer(config, seed=5)
+    cards = dealer.deal(4)
+    rows = np.zeros((4, config.global_state_shape))
+    write_cards(rows, cards, config)
+    for row, hand_cards in zip(rows, cards):
+        global_states, _, _, _ = init_state(config, cards=hand_cards)
+        gl = config.global_layout
+        columns = np.concatenate([gl.hand_columns[config.player_positions].ravel(), gl.board_columns])
+        assert np.array_equal(global_states[0, columns], row[columns])
+        assert np.array_equal(global_states[0, gl.board], CARDS[hand_cards[-5:]].ravel())
+
+
+def test_seeded_games_are_reproducible():
+    config = Config(num_players=4)
+    first, second = VecGame(config, 5, seed=3), VecGame(config, 5, seed=3)
+    for vec_game in (first, second):
+        vec_game.reset()
+    assert np.array_equal(first.observations, second.observations)
+    assert np.array_equal(first.hand_indices, np.zeros(5))
+    game = Game(config, seed=3)
+    global_state, _, _, _ = game.reset()
+    assert np.array_equal(global_state, first.global_state(0))
+    assert np.array_equal(global_state[0, config.global_layout.board], CARDS[game.dealer.replay(0, game.hand_index)[-5:]].ravel())
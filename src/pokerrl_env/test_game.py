@@ -0,0 +1,102 @@
+import numpy as np
+import pytest
+from pokerrl_env.config import Config
+from pokerrl_env.game import Game
+from pokerrl_env.view import json_view
+
+
+def legal_actions(action_mask):
+    return [int(action) for action in np.flatnonzero(action_mask)]
+
+
+def count_leaves(game, depth):
+    """ Depth first search over the next depth actions with push and undo """
+    done, action_mask = game.done, game.action_mask
+    if done or depth == 0 or not action_mask.any():
+        return 1
+    leaves = 0
+    for action in legal_actions(action_mask):
+        game.push()
+        game.step(action)
+        leaves += count_leaves(game, depth - 1)
+        game.undo()
+    return leaves
+
+
+def test_restore_rewinds_to_snapshot():
+    config = Config(num_players=3)
+    game = Game(config)
+    rng = np.random.default_rng(0)
+    for _ in range(10):
+        global_state, done, winnings, action_mask = game.reset()
+        game.step(legal_actions(action_mask)[-1])
+        snapshot = game.snapshot()
+        expected = [array.copy() for array in (game.global_state, game.action_mask)]
+        expected_investments = game.ledger.investments()
+        for _ in range(3):
+            done = game.done
+            while not done and game.action_mask.any():
+                _, done, _, _ = game.step(rng.choice(np.flatnonzero(game.action_mask)))
+            global_state, done, winnings, action_mask = game.restore(snapshot)
+            assert np.array_equal(global_state, expected[0])
+            assert np.array_equal(action_mask, expected[1])
+            assert game.ledger.investments() == expected_investments
+    with pytest.raises(AssertionError):
+        game.reset()
+        game.restore(snapshot)
+
+
+def test_depth_first_search_with_undo():
+    config = Config(num_players=2, validate_ledger=True)
+    game = Game(config)
+    global_state, _, _, action_mask = game.reset()
+    before = global_state.copy()
+    assert count_leaves(game, 4) > len(legal_actions(action_mask))
+    assert np.array_equal(game.global_state, before)
+    assert game.undo_stack == []
+    # a branch taken after undo matches the same action stepped from a restored root
+    root = game.snapshot()
+    for action in legal_actions(action_mask):
+        game.push()
+        branched, done, _, branched_mask = game.step(action)
+        branched, branched_mask = branched.copy(), branched_mask.copy()
+        game.undo()
+        game.restore(root)
+        fresh, fresh_done, _, fresh_mask = game.step(action)
+        assert np.array_equal(branched, fresh) and done == fresh_done and np.array_equal(branched_mask, fresh_mask)
+        game.restore(root)
+
+
+@pytest.mark.parametrize("seat", [None, 2])
+def test_delta_results_rebuild_the_hand(seat):
+    config = Config(num_players=3, is_server=True)
+    game = Game(config, delta=True, seat=seat)
+    rng = np.random.default_rng(0)
+    seq = 0
+    rows = []
+
+    def apply(result):
+        nonlocal seq, rows
+        assert result['seq'] == seq + 1 and result['start'] <= len(rows)
+        seq = result['seq']
+        rows = rows[:result['start']] + result['game_states']
+        assert rows == json_view(game.global_state, game.seat, config)
+
+    for _ in range(5):
+        result = game.reset()
+        apply(result)
+        while not result['done'] and any(result['action_mask']):
+            result = game.step(int(rng.choice(legal_actions(result['action_mask']))))
+            assert len(result['game_states']) <= 2
+            apply(result)
+    # restoring sends nothing new, stepping on from there replaces the undone rows, resync sends every row
+    apply(game.reset())
+    game.push()
+    apply(game.step(legal_actions(game.action_mask)[0]))
+    result = game.undo()
+    assert result['game_states'] == []
+    apply(result)
+    apply(game.step(legal_actions(game.action_mask)[-1]))
+    result = game.sync()
+    assert result['start'] == 0
+    apply(result)
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+from pokerrl_env.config import Config
+from pokerrl_env.game_tree import enumerate_public_tree
+from pokerrl_env.transition import init_state, step_state
+
+
+def count_sequences(global_states, action_mask, config):
+    """ Action sequences from a state to the end of the hand, by copying histories """
+    total = 0
+    for action in np.flatnonzero(action_mask):
+        next_states, done, _, next_mask = step_state(global_states, int(action), config)
+        total += 1 if done or not next_mask.any() else count_sequences(next_states, next_mask, config)
+    return total
+
+
+def count_paths(tree):
+    """ Root to terminal paths through the merged nodes """
+    paths = {}
+
+    def count(node):
+        if node not in paths:
+            paths[node] = 1 if tree.terminal[node] else sum(count(child) for child in tree.children(node)[1])
+        return paths[node]
+    return count(0)
+
+
+@pytest.mark.parametrize("num_players,stack_sizes", [(2, 4), (3, 3)])
+def test_public_tree_covers_every_action_sequence(num_players, stack_sizes):
+    config = Config(num_players=num_players, betsizes=(1, 0.5), stack_sizes=stack_sizes)
+    tree = enumerate_public_tree(config)
+    global_states, _, _, action_mask = init_state(config)
+    assert count_paths(tree) == count_sequences(global_states, action_mask, config)
+    assert tree.num_duplicates > 0
+    # chips are conserved and terminal nodes are leaves
+    assert np.all(tree.pot + tree.stacks.sum(axis=1) == num_players * stack_sizes)
+    assert np.all(np.diff(tree.child_offsets)[tree.terminal] == 0)
+    assert np.all(tree.player[tree.terminal] == 0)
+    for node in np.flatnonzero(~tree.terminal)[:20]:
+        actions, children = tree.children(node)
+        assert len(set(actions)) == len(actions)
+        assert np.all(tree.parent[children[tree.parent[children] == node]] == node)
+    stats = tree.stats()
+    assert stats['nodes'] == tree.num_nodes and stats['nbytes'] == tree.nbytes
+
+
+def test_public_tree_node_limit():
+    with pytest.raises(ValueError):
+        enumerate_public_tree(Config(num_players=2, betsizes=(1, 0.5), stack_sizes=10), max_nodes=100)
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+from pokerrl_env.config import Config
+from pokerrl_env.game import Game
+from pokerrl_env.hand_history import HandHistoryWriter, HandHistoryReader, replay
+
+
+def random_hands(config, num_hands, seed=0):
+    game = Game(config)
+    rng = np.random.default_rng(seed)
+    for _ in range(num_hands):
+        global_states, done, _, action_mask = game.reset()
+        actions = []
+        while not done and action_mask.any():
+            actions.append(rng.choice(np.flatnonzero(action_mask)))
+            global_states, done, _, action_mask = game.step(actions[-1])
+        yield global_states.copy(), actions
+
+
+@pytest.mark.parametrize("store_rows", [False, True])
+@pytest.mark.parametrize("config", [Config(num_players=3), Config(num_players=6, chip_units=100)])
+def test_write_and_read_back(tmp_path, config, store_rows):
+    path = tmp_path / 'hands.bin'
+    hands = list(random_hands(config, 30))
+    with HandHistoryWriter(path, config, store_rows=store_rows, chunk_size=7) as writer:
+        for global_states, actions in hands:
+            writer.write(global_states, actions)
+    reader = HandHistoryReader(path)
+    assert len(reader) == len(hands)
+    for (global_states, actions), record in zip(hands, reader):
+        assert np.array_equal(record.initial_states, global_states[:2])
+        assert list(record.actions) == list(actions)
+        assert (record.global_states is not None) == store_rows
+    for hand in (0, 17, 29):
+        assert np.array_equal(reader.global_states(hand), hands[hand][0])
+
+
+def test_append_to_existing_file(tmp_path):
+    path = tmp_path / 'hands.bin'
+    config = Config(num_players=2)
+    hands = list(random_hands(config, 10))
+    for start in (0, 5):
+        with HandHistoryWriter(path, config) as writer:
+            for global_states, actions in hands[start:start + 5]:
+                writer.write(global_states, actions)
+    reader = HandHistoryReader(path)
+    assert len(reader) == 10
+    assert np.array_equal(reader.global_states(7), hands[7][0])
+    with pytest.raises(ValueError):
+        HandHistoryWriter(path, Config(num_players=3))
+
+
+@pytest.mark.parametrize("config", [Config(num_players=2, stack_sizes=50.5), Config(num_players=2, stack_sizes=50.5, chip_units=10)])
+def test_header_keeps_fractional_stacks(tmp_path, config):
+    path = tmp_path / 'hands.bin'
+    HandHistoryWriter(path, config).close()
+    assert HandHistoryReader(path).config.stack_sizes == config.stack_sizes
+    # reopening with the same config appends
+    HandHistoryWriter(path, config).close()
+
+
+def test_replay_matches_engine():
+    config = Config(num_players=4)
+    for global_states, actions in random_hands(config, 10, seed=3):
+        assert np.array_equal(replay(global_states[:2], actions, config), global_states)
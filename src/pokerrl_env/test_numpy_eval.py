@@ -0,0 +1,84 @@
+import re
+import pathlib
+import warnings
+import numpy as np
+import pytest
+from pokerrl_env import cardlib, numpy_eval
+from pokerrl_env.test_cardlib import random_deals, requires_rust
+
+
+@pytest.fixture
+def numpy_backend():
+    previous = cardlib._backend
+    cardlib.set_backend('numpy')
+    yield
+    cardlib.set_backend(previous)
+
+
+def rust_table(name):
+    source = (pathlib.Path(__file__).parent.parent / 'rusteval' / 'src' / 'tables.rs').read_text()
+    return np.array(re.search(rf'pub static {name}: [^=]*= &\[([^\]]*)\]', source).group(1).split(','), dtype=np.int64)
+
+
+def test_tables_match_tables_rs():
+    for name in ('FLUSHES', 'UNIQUE5', 'CARD_PRODUCTS', 'PRODUCT_RANKS'):
+        table = getattr(numpy_eval, name)
+        expected = rust_table(name)
+        # the rust flush tables stop after the last non zero entry
+        assert np.array_equal(table[:expected.size], expected) and not table[expected.size:].any(), name
+
+
+def test_product_hash_is_perfect():
+    products = numpy_eval.CARD_PRODUCTS.astype(np.uint32)
+    slots = numpy_eval._slot(products) ^ numpy_eval.DISPLACEMENTS[numpy_eval._bucket(products)]
+    assert np.unique(slots).size == products.size
+    assert np.array_equal(numpy_eval.HASHED_PRODUCT_RANKS[slots], numpy_eval.PRODUCT_RANKS)
+
+
+def test_rank_classes():
+    # royal flush, wheel straight flush, worst high card
+    royal = [cardlib.encode([rank, 1]) for rank in (13, 12, 11, 10, 9)]
+    wheel = [cardlib.encode([rank, 2]) for rank in (13, 1, 2, 3, 4)]
+    worst = [cardlib.encode([rank, suit]) for rank, suit in ((6, 1), (4, 2), (3, 3), (2, 4), (1, 1))]
+    assert list(numpy_eval.rank([royal, wheel, worst])) == [1, 10, 7462]
+
+
+@requires_rust
+def test_numpy_matches_rust(numpy_backend):
+    cards = random_deals(5000, 9, seed=4)
+    numpy_ranks = cardlib.hand_rank_batch(cards[:, :4], cards[:, 4:])
+    holdem_ranks = cardlib.holdem_hand_rank_batch(cards[:, :2], cards[:, 2:7])
+    cardlib.set_backend('rust')
+    assert np.array_equal(numpy_ranks, cardlib.hand_rank_batch(cards[:, :4], cards[:, 4:]))
+    assert np.array_equal(holdem_ranks, cardlib.holdem_hand_rank_batch(cards[:, :2], cards[:, 2:7]))
+
+
+def test_numpy_backend_scalar_functions(numpy_backend):
+    hands = random_deals(200, 13, seed=5)
+    for deal in hands:
+        hand1, hand2, board = list(deal[:4]), list(deal[4:8]), list(deal[8:])
+        rank1, rank2 = cardlib.hand_rank(hand1, board), cardlib.hand_rank(hand2, board)
+        assert cardlib.winner(hand1, hand2, board) == np.sign(rank2 - rank1)
+        assert cardlib.holdem_winner(hand1[:2], hand2[:2], board) == np.sign(cardlib.holdem_hand_rank(hand2[:2], board) - cardlib.holdem_hand_rank(hand1[:2], board))
+
+
+def test_single_hand_ranks_without_overflow_warnings(numpy_backend):
+    # the product hashes wrap around on purpose, which numpy warns about for scalars
+    deals = random_deals(50, 5, seed=6)
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        ranks = [cardlib.rank(list(deal)) for deal in deals]
+    assert ranks == numpy_eval.rank(deals).tolist()
+
+
+def test_missing_library_falls_back_to_numpy(monkeypatch):
+    monkeypatch.setattr(cardlib, 'lib', None)
+    monkeypatch.setattr(cardlib, '_library_path', '/nonexistent/librusteval.so')
+    monkeypatch.setattr(cardlib, '_backend', 'auto')
+    monkeypatch.setattr(cardlib, '_failed_path', None)
+    with pytest.warns(UserWarning):
+        assert cardlib.get_backend() == 'numpy'
+    cards = random_deals(10, 9)
+    assert cardlib.hand_rank_batch(cards[:, :4], cards[:, 4:]).shape == (10,)
+    with pytest.raises(RuntimeError):
+        cardlib.equity(cards[:2, :4])
@@ -0,0 +1,39 @@
+from multiprocessing import shared_memory
+import numpy as np
+import pytest
+from pokerrl_env.config import Config
+from pokerrl_env.rollout import RolloutEngine
+
+
+def test_rollout_engine_collects_trajectories():
+    config = Config(num_players=3)
+    with RolloutEngine(config, num_tables=6, num_workers=2, num_steps=20) as engine:
+        for _ in range(2):
+            trajectories = engine.collect()
+            actions = trajectories["actions"]
+            action_masks = trajectories["action_masks"]
+            assert actions.shape == (20, 6)
+            assert trajectories["observations"].shape == (20, 6, config.player_state_shape)
+            # every action taken was legal
+            assert np.all(np.take_along_axis(action_masks, actions[..., None], axis=2) == 1)
+            rewards = trajectories["rewards"]
+            assert np.all(rewards[~trajectories["dones"]] == 0)
+            assert np.allclose(rewards.sum(axis=2), 0)
+            assert trajectories["dones"].any()
+        # workers are seeded differently, so their tables see different cards
+        observations = trajectories["observations"][0]
+        assert not np.array_equal(observations[0, :8], observations[3, :8])
+
+
+def test_dead_worker_raises_and_close_frees_memory():
+    engine = RolloutEngine(Config(num_players=2), num_tables=4, num_workers=2, num_steps=5)
+    engine.collect()
+    names = [block.name for block in engine.blocks.values()]
+    engine.workers[1].kill()
+    engine.workers[1].join()
+    with pytest.raises(RuntimeError, match="worker 1 died"):
+        engine.collect()
+    engine.close()
+    for name in names:
+        with pytest.raises(FileNotFoundError):
+            shared_memory.SharedMemory(name=name)
@@ -0,0 +1,115 @@
+import asyncio
+import heapq
+import json
+from pokerrl_env.config import Config
+from pokerrl_env.server import GameServer, GameClient, run_load, encode_messages
+from pokerrl_env.view import json_view
+
+
+def serve(test, **kwargs):
+    """ Runs test(server, client) against a fresh server on a free port """
+    async def main():
+        server = GameServer(Config(num_players=2, is_server=True), **kwargs)
+        await server.start()
+        client = await GameClient().connect(port=server.port)
+        try:
+            return await test(server, client)
+        finally:
+            await client.close()
+            await server.close()
+    return asyncio.run(main())
+
+
+def to_json(value):
+    """ value as a client receives it """
+    return json.loads(encode_messages([value]))
+
+
+def legal_actions(state):
+    return [action for action, legal in enumerate(state['action_mask']) if legal]
+
+
+def test_hands_play_to_the_end():
+    async def test(server, client):
+        state = await client.open_table()
+        table = state['table']
+        for _ in range(3):
+            while not state['done']:
+                state = await client.step(table, legal_actions(state)[0])
+                assert state['table'] == table and 'error' not in state
+            assert state['winnings'] is not None
+            state = await client.reset(table)
+            assert not state['done']
+        assert (await client.close_table(table))['closed']
+        assert table not in server.tables
+    serve(test)
+
+
+def test_bad_requests_get_errors():
+    async def test(server, client):
+        state = await client.open_table()
+        illegal = [action for action, legal in enumerate(state['action_mask']) if not legal][0]
+        assert 'not legal' in (await client.step(state['table'], illegal))['error']
+        assert 'No table' in (await client.step(state['table'] + 1, 0))['error']
+        await client.open_table()
+        assert 'full' in (await client.open_table())['error']
+    serve(test, max_tables=2)
+
+
+def test_idle_tables_time_out():
+    async def test(server, client):
+        state = await client.open_table()
+        push = await asyncio.wait_for(client.pushes.get(), timeout=2)
+        assert push['timeout'] and push['table'] == state['table']
+        assert 'id' not in push
+        assert server.timeouts >= 1
+    serve(test, action_timeout=0.05)
+
+
+def test_all_in_tables_are_not_timed_out():
+    async def test(server, client):
+        state = await client.open_table()
+        table = state['table']
+        # Both players all in before the river: the hand is left undone with nothing legal to do
+        for action in [4, 8, 3, 3, 10, 2, 10, 9]:
+            state = await client.step(table, action)
+        assert not state['done'] and not any(state['action_mask'])
+        # Even an expired deadline left over for the table must not act for it
+        heapq.heappush(server.deadlines, (0.0, table, server.tables[table].turn))
+        await asyncio.sleep(0.2)
+        assert server.timeouts == 0 and client.pushes.empty()
+        assert not server.tables[table].game.done
+        # and other tables still time out
+        other = await client.open_table()
+        push = await asyncio.wait_for(client.pushes.get(), timeout=2)
+        assert push['table'] == other['table'] and push['timeout']
+    serve(test, action_timeout=0.05)
+
+
+def test_run_load():
+    async def test(server, client):
+        return await run_load(port=server.port, num_tables=8, num_connections=2, seconds=0.2)
+    results = serve(test)
+    assert results['tables'] == 8
+    assert results['actions_per_sec'] > 0
+    assert results['p99_action_ms'] >= results['p50_action_ms']
+
+
+def test_delta_tables_send_new_rows():
+    async def test(server, client):
+        state = await client.open_table(delta=True, seat=2)
+        table, rows = state['table'], state['game_states']
+        game = server.tables[table].game
+        config = server.config
+        assert state['start'] == 0 and rows == to_json(json_view(game.global_state, 2, config))
+        for _ in range(3):
+            while not state['done'] and any(state['action_mask']):
+                state = await client.step(table, legal_actions(state)[0])
+                assert state['start'] <= len(rows)
+                rows = rows[:state['start']] + state['game_states']
+                assert rows == to_json(json_view(game.global_state, 2, config))
+            state = await client.reset(table)
+            rows = state['game_states']
+        synced = await client.sync(table)
+        assert synced['seq'] == state['seq'] + 1 and synced['game_states'] == rows
+    serve(test)
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+from pokerrl_env import tracing
+from pokerrl_env.config import Config
+from pokerrl_env.game import Game
+
+
+@pytest.fixture
+def enabled():
+    tracing.reset()
+    tracing.enable()
+    yield
+    tracing.disable()
+    tracing.reset()
+
+
+def play(num_hands, seed=0):
+    game = Game(Config(num_players=3))
+    rng = np.random.default_rng(seed)
+    steps = 0
+    for _ in range(num_hands):
+        _, done, _, action_mask = game.reset()
+        while not done and action_mask.any():
+            _, done, _, action_mask = game.step(rng.choice(np.flatnonzero(action_mask)))
+            steps += 1
+    return steps
+
+
+def test_counters_and_timers(enabled):
+    steps = play(20)
+    stats = tracing.snapshot()
+    assert stats['counters']['steps'] == steps
+    assert 0 < stats['counters']['hands_finished'] <= 20
+    assert stats['counters']['showdowns'] <= stats['counters']['hands_finished']
+    assert stats['timers']['step']['calls'] == steps
+    assert stats['timers']['mask']['calls'] > steps
+    assert stats['timers']['step']['seconds'] > stats['timers']['mask']['seconds']
+
+
+def test_disabled_records_nothing():
+    tracing.reset()
+    play(5)
+    assert tracing.snapshot() == {'counters': {}, 'timers': {}}
+
+
+def test_periodic_dump(enabled):
+    dumps = []
+    tracing.enable(dump_interval=0, dump=dumps.append)
+    play(2)
+    assert dumps and dumps[-1]['counters']['steps'] > 0
@@ -6,6 +6,9 @@ from pokerrl_env.config import Config
 from pokerrl_env.datatypes import POSITION_TO_SEAT, SEAT_TO_POSITION, StateActions, Street
 from pokerrl_env.utils import calculate_pot_limit_betsize, readable_card_to_int
 from pokerrl_env.transition import get_action_mask,players_finished,step_state,init_state
+from pokerrl_env.ledger import Ledger
+from pokerrl_env.buffer import HistoryBuffer, CompactHistory
+import random
 
 config = Config(num_players=6)
 
@@ -683,4 +686,158 @@ def test_return_investments():
     # assert player_amount_invested_per_street[2] == 27
     # assert player_amount_invested_per_street[6] == 27
     # assert player_total_amount_invested[2] == 27
-    # assert player_total_amount_invested[6] == 27
\ No newline at end of file
+    # assert player_total_amount_invested[6] == 27
+
+@pytest.mark.parametrize("num_players", [2, 3, 6])
+def test_ledger_matches_return_investments(num_players):
+    config = Config(num_players=num_players, validate_ledger=True)
+    rng = np.random.default_rng(num_players)
+    for _ in range(20):
+        global_state,done,winnings,action_mask = init_state(config)
+        ledger = Ledger.from_states(global_state, config)
+        while not done and action_mask.any():
+            action = rng.choice(np.flatnonzero(action_mask))
+            global_state,done,winnings,action_mask = step_state(global_state, action, config, ledger)
+        ledger.validate(global_state)
+
+
+@pytest.mark.parametrize("max_rows", [None, 2])
+def test_history_buffer_matches_concatenate(max_rows):
+    config = Config(num_players=3)
+    history = HistoryBuffer(config, max_rows)
+    rng = np.random.default_rng(0)
+    for hand in range(10):
+        random.seed(hand)
+        global_state,done,winnings,action_mask = init_state(config)
+        random.seed(hand)
+        buffered_state,_,_,_ = init_state(config, history)
+        ledger = Ledger.from_states(buffered_state, config)
+        while not done and action_mask.any():
+            action = rng.choice(np.flatnonzero(action_mask))
+            global_state,done,winnings,action_mask = step_state(global_state, action, config)
+            buffered_state,buffered_done,buffered_winnings,buffered_mask = step_state(buffered_state, action, config, ledger, history)
+            assert np.array_equal(global_state, buffered_state)
+            assert np.array_equal(action_mask, buffered_mask)
+            assert done == buffered_done and winnings == buffered_winnings
+
+
+@pytest.mark.parametrize("num_players", [2, 6])
+def test_compact_history_materializes_full_rows(num_players):
+    config = Config(num_players=num_players)
+    history = HistoryBuffer(config)
+    compact = CompactHistory(config, max_rows=2)
+    rng = np.random.default_rng(num_players)
+    for _ in range(10):
+        global_state,done,winnings,action_mask = init_state(config, history)
+        compact.reset()
+        compact.append(global_state)
+        while not done and action_mask.any():
+            action = rng.choice(np.flatnonzero(action_mask))
+            num_rows = global_state.shape[0]
+            global_state,done,winnings,action_mask = step_state(global_state, action, config, history=history)
+            compact.append(global_state[num_rows:])
+            assert np.array_equal(compact.view(), global_state)
+        assert np.array_equal(history.compact().materialize(), global_state)
+        assert compact.nbytes < global_state.nbytes
+
+
+@pytest.mark.parametrize("num_players", [2, 3, 6])
+def test_chip_units_play_in_whole_chips(num_players):
+    config = Config(num_players=num_players, chip_units=100)
+    assert config.blinds == (50, 100) and config.stack_sizes == 10000
+    history = HistoryBuffer(config)
+    rng = np.random.default_rng(num_players)
+    for _ in range(20):
+        global_state,done,winnings,action_mask = init_state(config, history)
+        ledger = Ledger.from_states(global_state, config)
+        while not done and action_mask.any():
+            action = rng.choice(np.flatnonzero(action_mask))
+            global_state,done,winnings,action_mask = step_state(global_state, action, config, ledger, history)
+            assert global_state.dtype == np.int32
+        if done:
+            results = [winnings[position]['result'] for position in config.player_positions]
+            assert sum(results) == 0
+            assert all(float(result).is_integer() for result in results)
+
+
+def test_calculate_winnings_splits_whole_chips():
+    players = [Player(position=position, stack=0, active=1, hand_value=1, total_invested=5) for position in (1, 2, 3)]
+    pots = [[15, players[:2]]]
+    winnings = calculate_winnings(pots, players, whole_chips=True)
+    assert [winnings[position]['result'] for position in (1, 2, 3)] == [3, 2, -5]
+
+
+def test_chip_units_reject_overflowing_dtype():
+    with pytest.raises(AssertionError):
+        Config(num_players=6, chip_units=100, state_dtype=np.int16)
+    with pytest.raises(AssertionError):
+        Config(chip_units=3)
+
+
+def test_holdem_layout_narrows_hands():
+    holdem = Config(game_type=GameTypes.HOLDEM, num_players=6)
+    omaha = Config(num_players=6)
+    gl = holdem.global_layout
+    assert gl.hand_columns.shape == (7, 4)
+    assert holdem.global_state_shape == omaha.global_state_shape - 24
+    assert holdem.player_state_shape == omaha.player_state_shape - 4
+    assert list(holdem.global_state_mapping) == list(omaha.global_state_mapping)
+    assert gl.board_columns.size == omaha.global_layout.board_columns.size
+    assert gl.current_player == holdem.global_state_shape - 1
+
+
+@pytest.mark.parametrize("num_players", [2, 6])
+def test_holdem_hands_show_down_with_holdem_ranks(num_players):
+    config = Config(game_type=GameTypes.HOLDEM, num_players=num_players)
+    gl = config.global_layout
+    random.seed(num_players)
+    rng = np.random.default_rng(num_players)
+    for _ in range(30):
+        global_state,done,winnings,action_mask = init_state(config)
+        hands = global_state[0, gl.hand_columns[config.player_positions]]
+        dealt = np.concatenate([hands.reshape(-1, 2), global_state[0, gl.board].reshape(-1, 2)])
+        assert len({tuple(card) for card in dealt}) == 2 * num_players + 5
+        while not done and action_mask.any():
+            global_state,done,winnings,action_mask = step_state(global_state, rng.choice(np.flatnonzero(action_mask)), config)
+        if done:
+            board = encode_cards(global_state[-1, gl.board])
+            for position in config.player_positions:
+                if winnings[position]['hand']:
+                    expected = holdem_hand_rank_batch(encode_cards(global_state[-1, gl.hand[position]])[None], board)[0]
+                    assert winnings[position]['hand_value'] == expected
+
+
+def test_restore_state_matches_fresh_play():
+    config = Config(num_players=4)
+    rng = np.random.default_rng(4)
+    history = HistoryBuffer(config)
+    for _ in range(10):
+        global_state,done,winnings,action_mask = init_state(config, history)
+        ledger = Ledger.from_states(global_state, config)
+        global_state,done,winnings,action_mask = step_state(global_state, np.flatnonzero(action_mask)[-1], config, ledger, history)
+        snapshot = snapshot_state(history, ledger, done, winnings, action_mask)
+        prefix = global_state.copy()
+        for _ in range(3):
+            actions = []
+            global_state,done,winnings,action_mask = restore_state(snapshot, history, ledger)
+            assert np.array_equal(global_state, prefix)
+            while not done and action_mask.any():
+                actions.append(rng.choice(np.flatnonzero(action_mask)))
+                global_state,done,winnings,action_mask = step_state(global_state, actions[-1], config, ledger, history)
+            ledger.validate(global_state)
+            # same actions without snapshots, replaying investments from the rows
+            replayed = prefix
+            for action in actions:
+                replayed,replayed_done,_,_ = step_state(replayed, action, config)
+            assert np.array_equal(replayed, global_state)
+
+
+def test_returned_masks_are_the_callers_own():
+    # masks come from a shared cache, editing one must not change what the next hand sees
+    heads_up = Config(num_players=2)
+    global_states,done,winnings,action_mask = init_state(heads_up)
+    expected = action_mask.copy()
+    action_mask[:] = 0
+    assert np.array_equal(init_state(heads_up)[3], expected)
+    global_states,done,winnings,action_mask = step_state(global_states, int(np.flatnonzero(expected)[0]), heads_up)
+    action_mask[0] = 1 - action_mask[0]
@@ -1,8 +1,8 @@
-from pokerrl_env.datatypes import BetLimits, GameTypes, Player, Positions
-from pokerrl_env.utils import is_next_player_the_aggressor,return_deck
+from pokerrl_env.datatypes import BetLimits, GameTypes, Player, Positions, Street
+from pokerrl_env.utils import action_options, action_cache_info, clear_action_cache, is_next_player_the_aggressor, return_deck
 import pytest
 from pokerrl_env.config import Config
-from pokerrl_env.transition import init_state
+from pokerrl_env.transition import get_action_mask, init_state
 import numpy as np
 
 
@@ -87,4 +87,67 @@ def test_is_next_player_the_aggressor7():
     current_player = 1
     last_agro_player = 2
     result = is_next_player_the_aggressor(active_players, current_player, last_agro_player)
-    assert result == True
\ No newline at end of file
+    assert result == True
+
+
+def test_layouts_match_mappings():
+    config = Config(num_players=6)
+    gl = config.global_layout
+    pl = config.player_layout
+    assert Config(num_players=2).global_layout is gl
+    for i in range(1,7):
+        assert gl.stack[i] == config.global_state_mapping[f'player_{i}_stack']
+        assert gl.active[i] == config.global_state_mapping[f'player_{i}_active']
+        assert gl.position[i] == config.global_state_mapping[f'player_{i}_position']
+        assert list(gl.hand_columns[i]) == list(range(*config.global_state_mapping[f'player_{i}_hand_range']))
+    for i in range(1,6):
+        assert pl.stack[i] == config.player_state_mapping[f'vil_{i}_stack']
+    assert gl.board == slice(*config.global_state_mapping['board_range'])
+    assert gl.pot == config.global_state_mapping['pot']
+    assert pl.hero_stack == config.player_state_mapping['hero_stack']
+    assert not gl.stack.flags.writeable
+
+
+@pytest.mark.parametrize("bet_limit", [BetLimits.POT_LIMIT, BetLimits.NO_LIMIT])
+@pytest.mark.parametrize("chip_units", [None, 100])
+def test_action_options_match_mask_and_betsize_functions(bet_limit, chip_units):
+    config = Config(num_players=3, bet_limit=bet_limit, chip_units=chip_units)
+    gl = config.global_layout
+    scale = chip_units or 1
+    rng = np.random.default_rng(0)
+    clear_action_cache()
+    for _ in range(300):
+        global_state = np.zeros(config.global_state_shape, dtype=config.state_dtype)
+        last_agro_action = rng.choice([0, 4, 5, 8])
+        last_agro_amount = int(rng.integers(1, 20)) * scale // 2 if last_agro_action else 0
+        investment = int(rng.integers(0, 10)) * scale // 2 if last_agro_action else 0
+        pot = last_agro_amount + investment + int(rng.integers(1, 40)) * scale
+        stack = int(rng.integers(0, 100)) * scale // 2
+        # A third of the draws are the big blind facing its own blind preflop, where it can check its option
+        facing_own_blind = rng.random() < 1 / 3
+        current_player = Positions.BIG_BLIND if facing_own_blind else 3
+        global_state[gl.last_agro_action] = last_agro_action
+        global_state[gl.last_agro_amount] = last_agro_amount
+        global_state[gl.current_player] = current_player
+        global_state[gl.street] = Street.PREFLOP if facing_own_blind or rng.random() < 0.5 else Street.FLOP
+        global_state[gl.last_agro_position] = Positions.BIG_BLIND if facing_own_blind else 1
+        global_state[gl.stack[current_player]] = stack
+        global_state[gl.pot] = pot
+        blind_option = global_state[gl.street] == Street.PREFLOP and current_player == Positions.BIG_BLIND and \
+            global_state[gl.last_agro_position] == Positions.BIG_BLIND
+        options = action_options(config, last_agro_action, last_agro_amount, pot, investment, stack, blind_option)
+        expected_mask = config.return_action_mask(global_state, config, pot, investment, stack)
+        assert np.array_equal(options.mask, expected_mask)
+        # and the engine derives the same blind option from the state
+        if stack > 0:
+            assert np.array_equal(get_action_mask(global_state, {current_player: investment}, config), expected_mask)
+        for action in range(3, config.num_actions):
+            category, betsize = config.return_betsize(last_agro_action, last_agro_amount, config, action, pot, investment, stack)
+            if chip_units:
+                betsize = int(round(betsize))
+            assert options.category == category
+            assert options.betsizes[action - 3] == betsize
+    assert not options.mask.flags.writeable
+    action_options(config, last_agro_action, last_agro_amount, pot, investment, stack)
+    info = action_cache_info()
+    assert info['hits'] >= 1 and info['misses'] == info['size']
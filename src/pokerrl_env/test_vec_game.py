@@ -0,0 +1,86 @@
+import random
+import numpy as np
+import pytest
+from pokerrl_env.config import Config
+from pokerrl_env.dealer import Dealer
+from pokerrl_env.transition import init_state, step_state
+from pokerrl_env.vec_game import VecGame
+
+
+@pytest.mark.parametrize("num_players", [2, 6])
+def test_vec_game_matches_step_state(num_players):
+    config = Config(num_players=num_players)
+    num_tables = 4
+    vec_game = VecGame(config, num_tables)
+    # Small block so tables have to grow
+    vec_game._grow(2)
+    random.seed(0)
+    observations, action_masks = vec_game.reset()
+    random.seed(0)
+    tables = [init_state(config) for _ in range(num_tables)]
+    rng = np.random.default_rng(0)
+    for _ in range(10):
+        # Only play hands that are still running on every table, so both sides draw decks in the same order
+        if not all(table[3].any() for table in tables):
+            break
+        actions = np.array([rng.choice(np.flatnonzero(table[3])) for table in tables])
+        observations, action_masks, rewards, dones = vec_game.step(actions)
+        if dones.any():
+            break
+        for i in range(num_tables):
+            tables[i] = step_state(tables[i][0], actions[i], config)
+            assert np.array_equal(vec_game.global_state(i), tables[i][0])
+            assert np.array_equal(action_masks[i], tables[i][3])
+            assert not tables[i][1]
+
+
+@pytest.mark.parametrize("num_players", [2, 6])
+def test_vec_game_matches_step_state_across_hands(num_players):
+    config = Config(num_players=num_players)
+    num_tables = 4
+    vec_game = VecGame(config, num_tables, seed=11)
+    vec_game._grow(2)
+    observations, action_masks = vec_game.reset()
+    # The same Dealer streams deal the reference tables, so redeals line up however the hands interleave
+    dealer = Dealer(config, seed=11, streams=num_tables)
+
+    def deal(table):
+        hand_index, cards = dealer.next_hand(table)
+        assert vec_game.hand_indices[table] == hand_index
+        return init_state(config, cards=cards)
+
+    tables = [deal(i) for i in range(num_tables)]
+    hands = np.zeros(num_tables, dtype=int)
+    rng = np.random.default_rng(0)
+    for _ in range(300):
+        actions = np.array([rng.choice(np.flatnonzero(table[3])) for table in tables])
+        observations, action_masks, rewards, dones = vec_game.step(actions)
+        for i in range(num_tables):
+            global_states, done, winnings, action_mask = step_state(tables[i][0], actions[i], config)
+            finished = done or not action_mask.any()
+            assert dones[i] == finished
+            if done:
+                assert np.allclose(rewards[i], [config.from_chips(winnings[position]['result']) for position in config.player_positions])
+            if finished:
+                assert vec_game.truncated[i] == (not done)
+                hands[i] += 1
+                global_states, _, _, action_mask = tables[i] = deal(i)
+            else:
+                tables[i] = (global_states, done, winnings, action_mask)
+            assert np.array_equal(vec_game.global_state(i), global_states)
+            assert np.array_equal(action_masks[i], action_mask)
+    assert hands.min() >= 3
+
+
+def test_vec_game_auto_reset():
+    config = Config(num_players=2)
+    vec_game = VecGame(config, 3)
+    observations, action_masks = vec_game.reset()
+    # Everybody folds preflop
+    observations, action_masks, rewards, dones = vec_game.step(np.zeros(3, dtype=int))
+    assert dones.all()
+    assert np.allclose(rewards.sum(axis=1), 0)
+    assert np.all(rewards[:, 0] == -0.5)
+    assert all(vec_game.global_state(i).shape[0] == 2 for i in range(3))
+    assert observations.shape == (3, config.player_state_shape)
+    assert action_masks.shape == (3, config.num_actions)
@@ -1,9 +1,10 @@
 import numpy as np
-from pokerrl_env.datatypes import Positions
+from pokerrl_env.datatypes import GameTypes, Positions
 import pytest
-from pokerrl_env.view import player_view, human_readable_view,return_board_cards
+import random
+from pokerrl_env.view import player_view, all_player_views, human_readable_view,return_board_cards, convert_global_state_to_player_view
 from pokerrl_env.config import Config
-from pokerrl_env.transition import init_state
+from pokerrl_env.transition import init_state, step_state
 
 
 @pytest.fixture
@@ -54,6 +55,23 @@ def test_player_view(initial_states,utg_position,config:Config):
     assert np.all(player_states[:, 20] == utg_position), f"Player index should be consistent in the player view. {player_states[:, 20]}, {utg_position}"
 
 
+@pytest.mark.parametrize("game_type", [GameTypes.OMAHA_HI, GameTypes.HOLDEM])
+@pytest.mark.parametrize("num_players", [2, 3, 6])
+def test_gathered_views_match_row_by_row(num_players, game_type):
+    config = Config(game_type=game_type, num_players=num_players)
+    random.seed(3)
+    for _ in range(20):
+        global_states, done, _, action_mask = init_state(config)
+        while not done and action_mask.any():
+            global_states, done, _, action_mask = step_state(global_states, random.choice(np.flatnonzero(action_mask)), config)
+        views = all_player_views(global_states, config)
+        assert views.shape == (num_players, global_states.shape[0], config.player_state_shape)
+        for seat, position in enumerate(config.player_positions):
+            expected = np.stack([convert_global_state_to_player_view(global_state, position, config) for global_state in global_states])
+            assert np.array_equal(player_view(global_states, position, config), expected)
+            assert np.array_equal(views[seat], expected)
+
+
 def test_human_readable_view(initial_states,config):
     dealer_position = Positions.DEALER
     global_state,_,_,_ = initial_states
@@ -65,3 +83,13 @@ def test_human_readable_view(initial_states,config):
         assert "num_players" in state, "Number of players should be present in the human-readable view."
         assert "hero_position" in state, "Hero position should be present in the human-readable view."
 
+
+
+def test_views_convert_chip_units():
+    config = Config(num_players=2, chip_units=100)
+    global_state,_,_,_ = init_state(config)
+    player_states = player_view(global_state, Positions.BIG_BLIND, config)
+    pl = config.player_layout
+    assert np.allclose(player_states[:, pl.pot], [0.5, 1.5])
+    assert player_states[-1, pl.hero_stack] == 99
+    assert player_states[-1, pl.last_agro_amount] == 1
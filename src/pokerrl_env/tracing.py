@@ -0,0 +1,83 @@
+import functools
+import json
+import sys
+import time
+from collections import defaultdict
+
+# Per phase timers and event counters for the engine hot path.
+# Instrumented functions are wrapped with traced; while tracing is disabled the wrapper only checks a flag and calls through.
+
+_enabled = False
+_timers = defaultdict(lambda: [0, 0.0])
+_counters = defaultdict(int)
+_dump_interval = None
+_dump = None
+_last_dump = 0.0
+
+
+def traced(phase, **counters):
+    """ Time calls to the decorated function under phase while tracing is enabled.
+    counters maps a counter name to a function of the return value giving the increment. """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            tic = time.perf_counter()
+            result = fn(*args, **kwargs)
+            _record(phase, time.perf_counter() - tic, counters, result)
+            return result
+        return wrapper
+    return decorator
+
+
+def _record(phase, seconds, counters, result):
+    global _last_dump
+    timer = _timers[phase]
+    timer[0] += 1
+    timer[1] += seconds
+    for name, count in counters.items():
+        _counters[name] += count(result)
+    if _dump_interval is not None:
+        now = time.perf_counter()
+        if now - _last_dump >= _dump_interval:
+            _last_dump = now
+            _dump(snapshot())
+
+
+def _write_json_line(stats):
+    sys.stderr.write(json.dumps(stats) + '\n')
+
+
+def enable(dump_interval=None, dump=_write_json_line):
+    """ Start collecting. With dump_interval, dump(snapshot()) is called at most every dump_interval seconds,
+    by default writing a JSON line to stderr. """
+    global _enabled, _dump_interval, _dump, _last_dump
+    _enabled = True
+    _dump_interval = dump_interval
+    _dump = dump
+    _last_dump = time.perf_counter()
+
+
+def disable():
+    global _enabled, _dump_interval
+    _enabled = False
+    _dump_interval = None
+
+
+def is_enabled():
+    return _enabled
+
+
+def reset():
+    _timers.clear()
+    _counters.clear()
+
+
+def snapshot():
+    """ Copy of the stats so far: counters by name, and per phase the number of calls and total seconds.
+    Phase times are inclusive, so step contains the phases it calls. """
+    return {
+        'counters': dict(_counters),
+        'timers': {phase: {'calls': calls, 'seconds': seconds, 'mean_us': 1e6 * seconds / calls} for phase, (calls, seconds) in _timers.items()},
+    }
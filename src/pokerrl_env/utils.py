@@ -1,5 +1,7 @@
+from collections import namedtuple
+from functools import lru_cache
 from typing import List
-from pokerrl_env.datatypes import BET, RAISE, ModelActions, Player, StateActions, Street,Positions, int_to_rank, int_to_suit,rank_to_int,suit_to_int
+from pokerrl_env.datatypes import BET, RAISE, BetLimits, ModelActions, Player, StateActions, Street,Positions, int_to_rank, int_to_suit,rank_to_int,suit_to_int
 from random import shuffle
 import numpy as np
 
@@ -21,7 +23,7 @@ def readable_card_to_int(card):
     return [rank_to_int[card[0]],suit_to_int[card[1]]]
 
 def return_current_player(global_states,config):
-    return int(global_states[-1,config.global_state_mapping['current_player']])
+    return int(global_states[-1,config.global_layout.current_player])
 
 def is_next_player_the_aggressor(active_players:List[Player], current_player:int, last_agro_position:int):
     """ for when the aggressor is allin and is not in active players. """
@@ -37,17 +39,18 @@ def is_next_player_the_aggressor(active_players:List[Player], current_player:int
 #### Action Mask Functions ####
 
 def calculate_pot_limit_mask(global_state,config,pot,current_player_investment,current_player_stack):
+    gl = config.global_layout
     action_mask = np.zeros(config.num_actions, dtype=int)  # +2 for check and fold
-    if global_state[config.global_state_mapping["last_agro_action"]] > ModelActions.CALL:
-        max_raise = (pot - current_player_investment) + (2 * global_state[config.global_state_mapping["last_agro_amount"]])
+    if global_state[gl.last_agro_action] > ModelActions.CALL:
+        max_raise = (pot - current_player_investment) + (2 * global_state[gl.last_agro_amount])
         max_bet = min(current_player_stack+current_player_investment,max_raise)
-        if max_bet <= global_state[config.global_state_mapping["last_agro_amount"]]:
+        if max_bet <= global_state[gl.last_agro_amount]:
             max_bet = 0
 
         # check for special case preflop blind situation.
-        if global_state[config.global_state_mapping["street"]] == Street.PREFLOP and \
-            global_state[config.global_state_mapping["current_player"]] == Positions.BIG_BLIND and \
-            global_state[config.global_state_mapping["last_agro_position"]] == Positions.BIG_BLIND:
+        if global_state[gl.street] == Street.PREFLOP and \
+            global_state[gl.current_player] == Positions.BIG_BLIND and \
+            global_state[gl.last_agro_position] == Positions.BIG_BLIND:
             action_mask[1] = 1
         else:
             action_mask[0] = 1 # fold is possible
@@ -66,13 +69,14 @@ def calculate_pot_limit_mask(global_state,config,pot,current_player_investment,c
 
 
 def calculate_no_limit_mask(global_state,config,pot,current_player_investment,current_player_stack):
+    gl = config.global_layout
     action_mask = np.zeros(config.num_actions, dtype=int)  # +2 for check and fold
     max_bet = current_player_stack
-    if global_state[config.global_state_mapping["last_agro_action"]] > ModelActions.CALL:
+    if global_state[gl.last_agro_action] > ModelActions.CALL:
         # check for special case preflop blind situation.
-        if global_state[config.global_state_mapping["street"]] == Street.PREFLOP and \
-            global_state[config.global_state_mapping["current_player"]] == Positions.BIG_BLIND and \
-            global_state[config.global_state_mapping["last_agro_position"]] == Positions.BIG_BLIND:
+        if global_state[gl.street] == Street.PREFLOP and \
+            global_state[gl.current_player] == Positions.BIG_BLIND and \
+            global_state[gl.last_agro_position] == Positions.BIG_BLIND:
             action_mask[1] = 1
         else:
             action_mask[0] = 1 # fold is possible
@@ -91,14 +95,15 @@ def calculate_no_limit_mask(global_state,config,pot,current_player_investment,cu
 
 def calculate_fixed_limit_mask(global_state,config,action,pot,current_player_investment,current_player_stack):
     """ TODO """
+    gl = config.global_layout
     action_mask = np.zeros(config.num_actions, dtype=int)  # +2 for check and fold
-    if global_state[config.global_state_mapping["last_agro_action"]] > ModelActions.CALL:
-        max_raise = (pot - current_player_investment) + (2 * global_state[config.global_state_mapping["last_agro_amount"]])
+    if global_state[gl.last_agro_action] > ModelActions.CALL:
+        max_raise = (pot - current_player_investment) + (2 * global_state[gl.last_agro_amount])
         max_bet = min(current_player_stack,max_raise)
         # check for special case preflop blind situation.
-        if global_state[config.global_state_mapping["street"]] == Street.PREFLOP and \
-            global_state[config.global_state_mapping["current_player"]] == Positions.BIG_BLIND and \
-            global_state[config.global_state_mapping["last_agro_position"]] == Positions.BIG_BLIND:
+        if global_state[gl.street] == Street.PREFLOP and \
+            global_state[gl.current_player] == Positions.BIG_BLIND and \
+            global_state[gl.last_agro_position] == Positions.BIG_BLIND:
             action_mask[1] = 1
         else:
             action_mask[0] = 1 # fold is possible
@@ -159,4 +164,97 @@ def calculate_fixed_limit_betsize(last_agro_action,last_agro_amount,config,actio
         max_bet = pot
         bet_ratio = config.betsizes[action - (ModelActions.CALL+1)]
         bet_amount = min(max_bet * bet_ratio,player_stack)
-        return BET, bet_amount
\ No newline at end of file
+        return BET, bet_amount
+
+
+#### Combined action options ####
+
+ActionOptions = namedtuple('ActionOptions', ['mask', 'category', 'betsizes'])
+
+
+def _enable_betsizes(action_mask, betsizes, highest_bet_ratio):
+    """ Betsizes are largest first, so every betsize from the first one within highest_bet_ratio is legal """
+    legal = betsizes <= highest_bet_ratio
+    if legal.any():
+        action_mask[3 + np.argmax(legal):] = 1
+
+
+def pot_limit_options(betsizes, min_bet, last_agro_action, last_agro_amount, pot, current_player_investment, current_player_stack, blind_option):
+    """ calculate_pot_limit_mask and calculate_pot_limit_betsize for every betsize at once. Returns (action mask, BET or RAISE, bet amounts) """
+    action_mask = np.zeros(betsizes.size + 3, dtype=int)
+    if last_agro_action > ModelActions.CALL:
+        max_raise = (pot - current_player_investment) + (2 * last_agro_amount)
+        max_bet = min(current_player_stack + current_player_investment, max_raise)
+        if max_bet <= last_agro_amount:
+            max_bet = 0
+        if blind_option:
+            action_mask[1] = 1
+        else:
+            action_mask[0] = 1
+            action_mask[2] = 1
+    else:
+        max_bet = min(current_player_stack, pot)
+        action_mask[1] = 1
+    if max_bet > 0:
+        _enable_betsizes(action_mask, betsizes, current_player_stack / max_bet)
+    if last_agro_action > StateActions.CALL:
+        max_raise = (2 * last_agro_amount) + (pot - current_player_investment)
+        min_raise = max(last_agro_amount + (pot - current_player_investment), min_bet)
+        return action_mask, RAISE, np.minimum(np.maximum(max_raise * betsizes, min_raise), current_player_stack + current_player_investment)
+    return action_mask, BET, np.minimum(pot * betsizes, current_player_stack)
+
+
+def no_limit_options(betsizes, min_bet, last_agro_action, last_agro_amount, pot, current_player_investment, current_player_stack, blind_option):
+    """ calculate_no_limit_mask and calculate_no_limit_betsize for every betsize at once. Returns (action mask, BET or RAISE, bet amounts) """
+    action_mask = np.zeros(betsizes.size + 3, dtype=int)
+    if last_agro_action > ModelActions.CALL:
+        if blind_option:
+            action_mask[1] = 1
+        else:
+            action_mask[0] = 1
+            action_mask[2] = 1
+    else:
+        action_mask[1] = 1
+    if current_player_stack > 0:
+        _enable_betsizes(action_mask, betsizes, current_player_stack / pot)
+    if last_agro_action > StateActions.CALL:
+        min_raise = last_agro_amount + (pot - current_player_investment)
+        return action_mask, RAISE, np.minimum(np.maximum(min_raise * betsizes, min_raise), current_player_stack + current_player_investment)
+    return action_mask, BET, np.minimum(pot * betsizes, current_player_stack)
+
+
+OPTIONS_BY_BET_LIMIT = {
+    BetLimits.POT_LIMIT: pot_limit_options,
+    BetLimits.NO_LIMIT: no_limit_options,
+}
+
+
+@lru_cache(maxsize=1 << 16)
+def _cached_action_options(betting_key, last_agro_action, last_agro_amount, pot, current_player_investment, current_player_stack, blind_option):
+    bet_limit, betsizes, min_bet, whole_chips = betting_key
+    action_mask, category, bet_amounts = OPTIONS_BY_BET_LIMIT[bet_limit](np.array(betsizes), min_bet, last_agro_action, last_agro_amount, pot,
+                                                                     current_player_investment, current_player_stack, blind_option)
+    if whole_chips:
+        # The bounds on the amounts are whole chips too, so rounding keeps them within them
+        bet_amounts = np.rint(bet_amounts).astype(np.int64)
+    action_mask.setflags(write=False)
+    bet_amounts.setflags(write=False)
+    return ActionOptions(action_mask, category, bet_amounts)
+
+
+def action_options(config, last_agro_action, last_agro_amount, pot, current_player_investment, current_player_stack, blind_option=False) -> ActionOptions:
+    """ Legal action mask, and the category and amount of every betsize action, for the player to act.
+
+    blind_option: the big blind can check its option preflop instead of calling.
+    Memoized on the arguments, so the returned arrays are shared and read only. See action_cache_info for hit rates. """
+    return _cached_action_options(config.betting_key, last_agro_action, last_agro_amount, pot, current_player_investment, current_player_stack, bool(blind_option))
+
+
+def action_cache_info() -> dict:
+    info = _cached_action_options.cache_info()
+    calls = info.hits + info.misses
+    return {'hits': info.hits, 'misses': info.misses, 'size': info.currsize, 'maxsize': info.maxsize, 'hit_rate': info.hits / calls if calls else 0.0}
+
+
+def clear_action_cache():
+    _cached_action_options.cache_clear()
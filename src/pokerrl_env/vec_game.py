@@ -0,0 +1,113 @@
+import numpy as np
+from pokerrl_env.config import Config
+from pokerrl_env.buffer import HistoryBuffer
+from pokerrl_env.dealer import Dealer
+from pokerrl_env.ledger import Ledger
+from pokerrl_env.transition import init_state, step_state
+from pokerrl_env.utils import return_current_player
+from pokerrl_env.view import gather_player_views
+
+
+class VecGame:
+    """ N tables stepped together, for self play.
+
+    Table state is kept as structure of arrays: every table's history lives in one
+    (num_tables, rows, global_state_shape) block, with a Ledger per table. step takes one action per
+    table, advances every table through step_state and resets finished tables in place.
+
+    Returns stacked arrays, all indexed by table:
+    - observations (num_tables, player_state_shape): the current player's view of the latest state
+    - action_masks (num_tables, num_actions)
+    - rewards (num_tables, num_players): result per player, ordered as config.player_positions, converted from chips. Non zero only on the step a hand ends.
+    - dones (num_tables,)
+
+    For tables that finished, the observation and mask already belong to the next hand. The returned arrays
+    are reused on every call; copy them to keep them.
+
+    With a seed, table i deals from stream streams[i] of a Dealer (streams defaults to one per table) and
+    hand_indices[i] is the index of its current hand in that stream, enough to deal the hand again.
+    Without one, cards are shuffled with the global random state. """
+    def __init__(self, config: Config, num_tables: int, seed=None, streams=None):
+        self.config = config
+        self.num_tables = num_tables
+        self.dealer = None if seed is None else Dealer(config, seed, num_tables if streams is None else streams)
+        self.hand_indices = np.full(num_tables, -1, dtype=np.int64)
+        self.global_states = np.zeros((num_tables, config.max_history_rows, config.global_state_shape), dtype=config.state_dtype)
+        self.histories = [HistoryBuffer(config, rows=self.global_states[i]) for i in range(num_tables)]
+        self.ledgers = [None] * num_tables
+        self.winnings = [None] * num_tables
+        self.current_players = np.zeros(num_tables, dtype=np.int64)
+        self.observations = np.zeros((num_tables, config.player_state_shape))
+        self.action_masks = np.zeros((num_tables, config.num_actions), dtype=np.int64)
+        self.rewards = np.zeros((num_tables, config.num_players))
+        self.dones = np.zeros(num_tables, dtype=bool)
+        # Tables that were left without a legal action before the hand ended. They are reset like finished tables, with zero reward.
+        self.truncated = np.zeros(num_tables, dtype=bool)
+
+    def reset(self):
+        """ Deals a new hand on every table. Returns (observations, action_masks) """
+        for table in range(self.num_tables):
+            self._reset_table(table)
+        self._observe()
+        self.rewards[:] = 0
+        self.dones[:] = False
+        self.truncated[:] = False
+        return self.observations, self.action_masks
+
+    def step(self, actions):
+        """ Applies actions[i] to table i. Returns (observations, action_masks, rewards, dones) """
+        actions = np.asarray(actions)
+        assert actions.shape == (self.num_tables,), f"Expected one action per table, got shape {actions.shape}"
+        self.rewards[:] = 0
+        self.dones[:] = False
+        self.truncated[:] = False
+        for table in range(self.num_tables):
+            history = self.histories[table]
+            global_states, done, winnings, action_mask = step_state(history.view(), int(actions[table]), self.config, self.ledgers[table], history)
+            if history.rows.base is not self.global_states:
+                self._grow(history.rows.shape[0])
+            if done:
+                self.rewards[table] = [self.config.from_chips(winnings[position]['result']) for position in self.config.player_positions]
+                self.winnings[table] = winnings
+                self.dones[table] = True
+                self._reset_table(table)
+            elif not action_mask.any():
+                self.winnings[table] = None
+                self.dones[table] = True
+                self.truncated[table] = True
+                self._reset_table(table)
+            else:
+                self._record(table, global_states, action_mask)
+        self._observe()
+        return self.observations, self.action_masks, self.rewards, self.dones
+
+    def global_state(self, table: int) -> np.ndarray:
+        """ History of the hand in progress on a table, as a view """
+        return self.histories[table].view()
+
+    def _reset_table(self, table: int):
+        history = self.histories[table]
+        cards = None
+        if self.dealer is not None:
+            self.hand_indices[table], cards = self.dealer.next_hand(table)
+        global_states, _, _, action_mask = init_state(self.config, history, cards)
+        self.ledgers[table] = Ledger.from_states(global_states, self.config)
+        self._record(table, global_states, action_mask)
+
+    def _record(self, table: int, global_states: np.ndarray, action_mask: np.ndarray):
+        self.current_players[table] = return_current_player(global_states, self.config)
+        self.action_masks[table] = action_mask
+
+    def _observe(self):
+        """ Current player's view of the latest row of every table, in one gather """
+        lengths = np.array([history.length for history in self.histories])
+        latest = self.global_states[np.arange(self.num_tables), lengths - 1]
+        gather_player_views(latest, self.current_players, self.config, out=self.observations)
+
+    def _grow(self, num_rows: int):
+        """ A hand outgrew the block. Reallocate every table with num_rows rows and point the buffers at it. """
+        global_states = np.zeros((self.num_tables, num_rows, self.config.global_state_shape), dtype=self.config.state_dtype)
+        for table, history in enumerate(self.histories):
+            global_states[table, :history.length] = history.rows[:history.length]
+            history.rows = global_states[table]
+        self.global_states = global_states
@@ -1,71 +1,162 @@
 import numpy as np
-from pokerrl_env.config import Config
-from pokerrl_env.datatypes import BOARD_CARDS_GIVEN_STREET, SEAT_TO_POSITION, INT_TO_STREET
+from functools import lru_cache
+from pokerrl_env.config import Config, return_layouts, return_mappings
+from pokerrl_env.datatypes import BOARD_CARDS_GIVEN_STREET, INT_POSITIONS_BY_NUM_PLAYERS, SEAT_TO_POSITION, INT_TO_STREET
 from pokerrl_env.utils import human_readable_cards
 
 
 def return_board_cards(global_state, config):
-    num_board_cards = BOARD_CARDS_GIVEN_STREET[ global_state[config.global_state_mapping["street"]] ]
-    if num_board_cards == 0:
-        padded_board_cards = np.zeros(10)
-    else:
-        board_slice = global_state[ config.global_state_mapping["board_range"][ 0 ] : config.global_state_mapping["board_range"][1] ][:num_board_cards]
-        padded_array = np.zeros(10 - num_board_cards)
-        padded_board_cards = np.concatenate((board_slice,padded_array))
+    gl = config.global_layout
+    num_board_cards = BOARD_CARDS_GIVEN_STREET[ global_state[gl.street] ]
+    padded_board_cards = np.zeros(gl.board_columns.size)
+    padded_board_cards[:num_board_cards] = global_state[gl.board][:num_board_cards]
     return padded_board_cards
 
 
+SHARED_FIELDS = [
+    "pot",
+    "amount_to_call",
+    "pot_odds",
+    "street",
+    "num_players",
+    "current_player",
+    "previous_amount",
+    "previous_position",
+    "previous_action",
+    "previous_bet_is_blind",
+    "last_agro_amount",
+    "last_agro_position",
+    "last_agro_action",
+    "last_agro_bet_is_blind",
+    "next_player",
+]
+
+@lru_cache(maxsize=None)
+def return_shared_columns(game_type):
+    """ (player columns, global columns) of the fields copied unchanged into every player view """
+    global_layout, player_layout = return_layouts(game_type)
+    player_columns = np.array([getattr(player_layout, key) for key in SHARED_FIELDS])
+    global_columns = np.array([getattr(global_layout, key) for key in SHARED_FIELDS])
+    return player_columns, global_columns
+
+
+@lru_cache(maxsize=None)
+def return_view_gather(game_type, num_players):
+    """ Index maps that build a player view with a single gather.
+
+    Returns (player_columns, global_columns, zero_columns, board_mask):
+    - player_columns (D,): the view columns filled from the global state
+    - global_columns (7, D): the global column feeding each of them, indexed by hero seat. Rows of seats not in the game are unused.
+    - zero_columns: view columns that are always zero (villain slots beyond num_players - 1)
+    - board_mask (streets, board width): which board cards are visible on each street """
+    gl, pl = return_layouts(game_type)
+    positions = INT_POSITIONS_BY_NUM_PLAYERS[num_players]
+    shared_player, shared_global = return_shared_columns(game_type)
+    num_villains = num_players - 1
+    player_columns = np.concatenate([
+        pl.hand_columns,
+        [pl.hero_active, pl.hero_stack, pl.hero_position],
+        pl.active[1:num_villains + 1], pl.stack[1:num_villains + 1], pl.position[1:num_villains + 1],
+        pl.board_columns,
+        shared_player,
+    ])
+    global_columns = np.zeros((7, player_columns.size), dtype=np.intp)
+    for hero in positions:
+        villains = [position for position in positions if position != hero]
+        global_columns[hero] = np.concatenate([
+            gl.hand_columns[hero],
+            [gl.active[hero], gl.stack[hero], gl.position[hero]],
+            gl.active[villains], gl.stack[villains], gl.position[villains],
+            gl.board_columns,
+            shared_global,
+        ])
+    _, player_state_shape, _, _ = return_mappings(game_type)
+    zero_columns = np.setdiff1d(np.arange(player_state_shape), player_columns)
+    num_streets = max(BOARD_CARDS_GIVEN_STREET) + 1
+    board_mask = np.arange(gl.board_columns.size) < np.array([BOARD_CARDS_GIVEN_STREET[street] for street in range(num_streets)])[:, None]
+    for array in (player_columns, global_columns, zero_columns, board_mask):
+        array.setflags(write=False)
+    return player_columns, global_columns, zero_columns, board_mask
+
+
+def gather_player_views(global_states, player_indices, config, out=None):
+    """ Player views of global_states (..., global_state_shape) for player_indices, which broadcast against the leading dimensions.
+
+    Same output as convert_global_state_to_player_view on every row, built with one gather. """
+    gl = config.global_layout
+    pl = config.player_layout
+    player_columns, global_columns, zero_columns, board_mask = return_view_gather(config.game_type, config.num_players)
+    player_indices = np.asarray(player_indices, dtype=np.intp)
+    shape = np.broadcast_shapes(global_states.shape[:-1], player_indices.shape)
+    if out is None:
+        out = np.zeros(shape + (config.player_state_shape,))
+    else:
+        out[..., zero_columns] = 0
+    columns = np.broadcast_to(global_columns[player_indices], shape + (player_columns.size,))
+    states = np.broadcast_to(global_states, shape + (global_states.shape[-1],))
+    out[..., player_columns] = np.take_along_axis(states, columns, axis=-1)
+    out[..., pl.board] *= board_mask[global_states[..., gl.street].astype(np.intp)]
+    if config.chip_units:
+        out[..., return_money_columns(config.game_type)] /= config.chip_units
+    return out
+
+
+@lru_cache(maxsize=None)
+def return_money_columns(game_type):
+    """ Player view columns holding chip amounts, converted out of chip units by the views """
+    _, pl = return_layouts(game_type)
+    columns = np.array([pl.hero_stack, *pl.stack[1:], pl.pot, pl.amount_to_call, pl.previous_amount, pl.last_agro_amount])
+    columns.setflags(write=False)
+    return columns
+
+
+def convert_winnings(winnings, config):
+    """ Copy of step_state winnings with results converted out of chip units """
+    if not config.chip_units or not winnings:
+        return winnings
+    return {position: dict(result, result=config.from_chips(result['result'])) if isinstance(result, dict) else config.from_chips(result)
+            for position, result in winnings.items()}
+
+
 def convert_global_state_to_player_view(global_state, player_index, config):
-    pmap = config.player_state_mapping
-    gmap = config.global_state_mapping
+    gl = config.global_layout
+    pl = config.player_layout
     player_state = np.zeros(config.player_state_shape)
-    vil_index = lambda x: x
-    for i,position in enumerate(config.player_positions,start=1):
-
+    vil = 1
+    for position in config.player_positions:
         # match player position
         if player_index == position:
-            player_state[pmap["hand_range"][0] : pmap["hand_range"][1]] = global_state[ gmap[f"player_{position}_hand_range"][0] : gmap[f"player_{position}_hand_range"][1] ]
-            player_state[pmap["hero_active"]] = global_state[gmap[f"player_{position}_active"]]
-            player_state[pmap["hero_stack"]] = global_state[gmap[f"player_{position}_stack"]]
-            player_state[pmap["hero_position"]] = global_state[gmap[f"player_{position}_position"]]
-            vil_index = lambda x: x - 1
+            player_state[pl.hand] = global_state[gl.hand[position]]
+            player_state[pl.hero_active] = global_state[gl.active[position]]
+            player_state[pl.hero_stack] = global_state[gl.stack[position]]
+            player_state[pl.hero_position] = global_state[gl.position[position]]
         else:
-            player_state[pmap[f"vil_{vil_index(i)}_active"]] = global_state[ gmap[f"player_{position}_active"] ]
-            player_state[pmap[f"vil_{vil_index(i)}_stack"]] = global_state[ gmap[f"player_{position}_stack"] ]
-            player_state[pmap[f"vil_{vil_index(i)}_position"]] = global_state[ gmap[f"player_{position}_position"] ]
+            player_state[pl.active[vil]] = global_state[gl.active[position]]
+            player_state[pl.stack[vil]] = global_state[gl.stack[position]]
+            player_state[pl.position[vil]] = global_state[gl.position[position]]
+            vil += 1
     # Copy over the board cards
-    player_state[pmap["board_range"][0] : pmap["board_range"][1]] = return_board_cards( global_state,config )
-    global_state[gmap["board_range"][0]]: global_state[gmap["board_range"][1]]
+    player_state[pl.board] = return_board_cards( global_state,config )
     # copy general state
-    for key in [
-        "pot",
-        "amount_to_call",
-        "pot_odds",
-        "street",
-        "num_players",
-        "current_player",
-        "previous_amount",
-        "previous_position",
-        "previous_action",
-        "previous_bet_is_blind",
-        "last_agro_amount",
-        "last_agro_position",
-        "last_agro_action",
-        "last_agro_bet_is_blind",
-        "next_player",
-    ]:
-        player_state[pmap[key]] = global_state[gmap[key]]
+    player_columns, global_columns = return_shared_columns(config.game_type)
+    player_state[player_columns] = global_state[global_columns]
+    if config.chip_units:
+        player_state[return_money_columns(config.game_type)] /= config.chip_units
     return player_state
 
 
 def player_view(global_states, player_index, config):
     assert player_index in list(range(1,7)), "Player index must be between 1 and 6"
     # assert global_states[-1, config.global_state_mapping["current_player"]] == player_index, "Player index does not match current player"
-    player_states = [
-        convert_global_state_to_player_view(global_states[i,:], player_index, config)
-        for i in range(global_states.shape[0])
-    ]
-    return np.stack(player_states)
+    assert player_index in config.player_positions, f"Player {player_index} is not seated in a {config.num_players} player game"
+    return gather_player_views(global_states, player_index, config)
+
+
+def all_player_views(global_states, config):
+    """ Every seat's view of every row, shape (num_players, rows, player_state_shape). Seats are ordered as config.player_positions """
+    player_indices = np.array(config.player_positions)[:, None]
+    return gather_player_views(global_states[None], player_indices, config)
+
 
 def flatten(data:list):
     return [item for sublist in data for item in sublist]
@@ -128,45 +219,46 @@ def human_readable_view(global_states, player_index, config,display=False):
     return readable_states
 
 def json_view(global_states, player_index, config:Config):
+    pl = config.player_layout
     player_states = player_view(global_states, player_index, config)
     json_states = []
     for state in player_states:
         state_object = {
-            'hero_cards'                :state[config.player_state_mapping['hand_range'][0]:config.player_state_mapping['hand_range'][1]].tolist(),
-            'board_cards'               :state[config.player_state_mapping['board_range'][0]:config.player_state_mapping['board_range'][1]].tolist(),
-            'street'                    :state[config.player_state_mapping['street']],
-            'num_players'               :state[config.player_state_mapping['num_players']],
-            'hero_position'             :state[config.player_state_mapping['hero_position']],
-            'hero_active'               :state[config.player_state_mapping['hero_active']],
-            'vil1_active'               :state[config.player_state_mapping['vil_1_active']],
-            'vil2_active'               :state[config.player_state_mapping['vil_2_active']],
-            'vil3_active'               :state[config.player_state_mapping['vil_3_active']],
-            'vil4_active'               :state[config.player_state_mapping['vil_4_active']],
-            'vil5_active'               :state[config.player_state_mapping['vil_5_active']],
-            'vil1_position'             :state[config.player_state_mapping['vil_1_position']],
-            'vil2_position'             :state[config.player_state_mapping['vil_2_position']],
-            'vil3_position'             :state[config.player_state_mapping['vil_3_position']],
-            'vil4_position'             :state[config.player_state_mapping['vil_4_position']],
-            'vil5_position'             :state[config.player_state_mapping['vil_5_position']],
-            'last_agro_amount'          :state[config.player_state_mapping['last_agro_amount']],
-            'last_agro_action'          :state[config.player_state_mapping['last_agro_action']],
-            'last_agro_position'        :state[config.player_state_mapping['last_agro_position']],
-            'last_agro_is_blind'        :state[config.player_state_mapping['last_agro_bet_is_blind']],
-            'hero_stack'                :state[config.player_state_mapping['hero_stack']],
-            'vil1_stack'                :state[config.player_state_mapping['vil_1_stack']],
-            'vil2_stack'                :state[config.player_state_mapping['vil_2_stack']],
-            'vil3_stack'                :state[config.player_state_mapping['vil_3_stack']],
-            'vil4_stack'                :state[config.player_state_mapping['vil_4_stack']],
-            'vil5_stack'                :state[config.player_state_mapping['vil_5_stack']],
-            'pot'                       :state[config.player_state_mapping['pot']],
-            'amount_to_call'            :state[config.player_state_mapping['amount_to_call']],
-            'pot_odds'                  :state[config.player_state_mapping['pot_odds']],
-            'previous_amount'           :state[config.player_state_mapping['previous_amount']],
-            'previous_position'         :state[config.player_state_mapping['previous_position']],
-            'previous_action'           :state[config.player_state_mapping['previous_action']],
-            'previous_bet_is_blind'     :state[config.player_state_mapping['previous_bet_is_blind']],
-            "current_player"            :state[config.player_state_mapping['current_player']],
-            "next_player"               :state[config.player_state_mapping['next_player']],
+            'hero_cards'                :state[pl.hand].tolist(),
+            'board_cards'               :state[pl.board].tolist(),
+            'street'                    :state[pl.street],
+            'num_players'               :state[pl.num_players],
+            'hero_position'             :state[pl.hero_position],
+            'hero_active'               :state[pl.hero_active],
+            'vil1_active'               :state[pl.active[1]],
+            'vil2_active'               :state[pl.active[2]],
+            'vil3_active'               :state[pl.active[3]],
+            'vil4_active'               :state[pl.active[4]],
+            'vil5_active'               :state[pl.active[5]],
+            'vil1_position'             :state[pl.position[1]],
+            'vil2_position'             :state[pl.position[2]],
+            'vil3_position'             :state[pl.position[3]],
+            'vil4_position'             :state[pl.position[4]],
+            'vil5_position'             :state[pl.position[5]],
+            'last_agro_amount'          :state[pl.last_agro_amount],
+            'last_agro_action'          :state[pl.last_agro_action],
+            'last_agro_position'        :state[pl.last_agro_position],
+            'last_agro_is_blind'        :state[pl.last_agro_bet_is_blind],
+            'hero_stack'                :state[pl.hero_stack],
+            'vil1_stack'                :state[pl.stack[1]],
+            'vil2_stack'                :state[pl.stack[2]],
+            'vil3_stack'                :state[pl.stack[3]],
+            'vil4_stack'                :state[pl.stack[4]],
+            'vil5_stack'                :state[pl.stack[5]],
+            'pot'                       :state[pl.pot],
+            'amount_to_call'            :state[pl.amount_to_call],
+            'pot_odds'                  :state[pl.pot_odds],
+            'previous_amount'           :state[pl.previous_amount],
+            'previous_position'         :state[pl.previous_position],
+            'previous_action'           :state[pl.previous_action],
+            'previous_bet_is_blind'     :state[pl.previous_bet_is_blind],
+            "current_player"            :state[pl.current_player],
+            "next_player"               :state[pl.next_player],
         }
         json_states.append(state_object)
     return json_states
\ No newline at end of file
@@ -0,0 +1,173 @@
+extern crate libc;
+
+use std::slice;
+use std::thread;
+use rng::Rng;
+use sim::{omaha_rank, holdem_best_rank_w_board};
+use tables;
+use self::libc::{c_long, c_double, size_t};
+
+pub const MAX_PLAYERS: usize = 6;
+
+// Monte Carlo boards per block. Every block draws from its own stream of the seed and blocks are summed in order,
+// so a seed gives the same equities whatever the number of threads.
+pub const BLOCK_ITERATIONS: u64 = 1024;
+
+fn block_rng(seed: u64, block: u64) -> Rng {
+    Rng::new(seed ^ block.wrapping_mul(0xD1B54A32D192ED03))
+}
+
+struct Deal<'a> {
+    hands: &'a [c_long],
+    num_players: usize,
+    hand_size: usize,
+    board: [c_long; 5],
+    board_size: usize,
+    deck: Vec<c_long>,
+}
+
+impl<'a> Deal<'a> {
+    // Adds each winner's share of the pot for a complete board to shares.
+    fn score(&self, board: &[c_long; 5], shares: &mut [f64]) {
+        let mut ranks = [0i32; MAX_PLAYERS];
+        let mut best = i32::max_value();
+        for p in 0..self.num_players {
+            let hand = &self.hands[p * self.hand_size..(p + 1) * self.hand_size];
+            ranks[p] = if self.hand_size == 4 {
+                omaha_rank([hand[0], hand[1], hand[2], hand[3]], *board)
+            } else {
+                holdem_best_rank_w_board([hand[0], hand[1]], *board)
+            };
+            if ranks[p] < best {
+                best = ranks[p];
+            }
+        }
+        let winners = ranks[..self.num_players].iter().filter(|r| **r == best).count();
+        for p in 0..self.num_players {
+            if ranks[p] == best {
+                shares[p] += 1.0 / winners as f64;
+            }
+        }
+    }
+
+    // Every completion of the board. Thread t of num_threads takes every num_threads'th completion.
+    fn exhaustive(&self, thread: usize, num_threads: usize, shares: &mut [f64]) -> u64 {
+        let missing = 5 - self.board_size;
+        let mut board = self.board;
+        let mut idx: Vec<usize> = (0..missing).collect();
+        let mut count = 0u64;
+        let mut boards = 0u64;
+        loop {
+            if count % num_threads as u64 == thread as u64 {
+                for (i, d) in idx.iter().enumerate() {
+                    board[self.board_size + i] = self.deck[*d];
+                }
+                self.score(&board, shares);
+                boards += 1;
+            }
+            count += 1;
+            // next combination in lexicographic order
+            let mut i = missing;
+            loop {
+                if i == 0 {
+                    return boards;
+                }
+                i -= 1;
+                if idx[i] < self.deck.len() - missing + i {
+                    break;
+                }
+            }
+            idx[i] += 1;
+            for j in (i + 1)..missing {
+                idx[j] = idx[j - 1] + 1;
+            }
+        }
+    }
+
+    // Random completions, by a partial Fisher-Yates shuffle of the remaining deck.
+    fn monte_carlo(&self, iterations: u64, rng: &mut Rng, shares: &mut [f64]) -> u64 {
+        let missing = 5 - self.board_size;
+        let mut deck = self.deck.clone();
+        let mut board = self.board;
+        for _ in 0..iterations {
+            for i in 0..missing {
+                let j = i + rng.below(deck.len() - i);
+                deck.swap(i, j);
+                board[self.board_size + i] = deck[i];
+            }
+            self.score(&board, shares);
+        }
+        iterations
+    }
+}
+
+// Equity of num_players hands (hand_size 4 for Omaha, 2 for Holdem) given board_size known board cards
+// and num_dead cards that can't come. Results go to equities[num_players], ties are split.
+// Turn and river boards, or iterations == 0, are enumerated exhaustively. Earlier streets run
+// iterations Monte Carlo boards from seed, in blocks of BLOCK_ITERATIONS. Work is split across num_threads threads.
+// Returns the number of boards evaluated, or -1 for invalid input, duplicate cards or too few cards left for the board.
+#[no_mangle]
+pub extern fn equity(hands: *const c_long, num_players: size_t, hand_size: size_t,
+                     board: *const c_long, board_size: size_t, dead: *const c_long, num_dead: size_t,
+                     iterations: size_t, seed: u64, num_threads: size_t, equities: *mut c_double) -> c_long {
+    if num_players < 2 || num_players > MAX_PLAYERS || (hand_size != 4 && hand_size != 2) || board_size > 5 {
+        return -1;
+    }
+    let hands = unsafe { slice::from_raw_parts(hands, num_players * hand_size) };
+    let known_board = unsafe { slice::from_raw_parts(board, board_size) };
+    let dead = unsafe { slice::from_raw_parts(dead, num_dead) };
+    let equities = unsafe { slice::from_raw_parts_mut(equities, num_players) };
+
+    let used: Vec<c_long> = hands.iter().chain(known_board.iter()).chain(dead.iter()).cloned().collect();
+    for (i, card) in used.iter().enumerate() {
+        if !tables::DECK.contains(&(*card as i64)) || used[..i].contains(card) {
+            return -1;
+        }
+    }
+    let mut full_board = [0; 5];
+    full_board[..board_size].copy_from_slice(known_board);
+    let deal = Deal {
+        hands: hands,
+        num_players: num_players,
+        hand_size: hand_size,
+        board: full_board,
+        board_size: board_size,
+        deck: tables::DECK.iter().map(|c| *c as c_long).filter(|c| !used.contains(c)).collect(),
+    };
+    // Not enough cards left to complete the board
+    if 5 - board_size > deal.deck.len() {
+        return -1;
+    }
+
+    let num_threads = if num_threads == 0 { 1 } else { num_threads };
+    let exhaustive = board_size >= 4 || iterations == 0;
+    let num_blocks = if exhaustive { 0 } else { (iterations as u64 + BLOCK_ITERATIONS - 1) / BLOCK_ITERATIONS };
+    let deal = &deal;
+    // (block, shares, boards) per exhaustive thread or Monte Carlo block
+    let mut results: Vec<(u64, Vec<f64>, u64)> = thread::scope(|scope| {
+        let workers: Vec<_> = (0..num_threads).map(|t| {
+            scope.spawn(move || {
+                if exhaustive {
+                    let mut shares = vec![0.0; num_players];
+                    let boards = deal.exhaustive(t, num_threads, &mut shares);
+                    return vec![(t as u64, shares, boards)];
+                }
+                (t as u64..num_blocks).step_by(num_threads).map(|block| {
+                    let mut shares = vec![0.0; num_players];
+                    let block_size = BLOCK_ITERATIONS.min(iterations as u64 - block * BLOCK_ITERATIONS);
+                    let boards = deal.monte_carlo(block_size, &mut block_rng(seed, block), &mut shares);
+                    (block, shares, boards)
+                }).collect()
+            })
+        }).collect();
+        workers.into_iter().flat_map(|w| w.join().unwrap()).collect()
+    });
+    results.sort_by_key(|r| r.0);
+
+    let total_boards: u64 = results.iter().map(|r| r.2).sum();
+    for p in 0..num_players {
+        let share: f64 = results.iter().map(|r| r.1[p]).sum();
+        equities[p] = if total_boards > 0 { share / total_boards as f64 } else { 0.0 };
+    }
+    total_boards as c_long
+}
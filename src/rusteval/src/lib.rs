@@ -1,4 +1,7 @@
 pub mod encode;
 pub mod rank;
 pub mod tables;
-pub mod sim;
\ No newline at end of file
+pub mod sim;
+pub mod lookup;
+pub mod rng;
+pub mod equity;
\ No newline at end of file
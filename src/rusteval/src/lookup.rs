@@ -0,0 +1,110 @@
+extern crate libc;
+
+use std::sync::OnceLock;
+use self::libc::c_long;
+use tables;
+
+// Open addressing table from prime product to rank, for the hands rank.rs finds by binary search.
+// 8192 slots for the 4888 products keeps probe chains short.
+const PRODUCT_TABLE_BITS: u32 = 13;
+const PRODUCT_TABLE_SIZE: usize = 1 << PRODUCT_TABLE_BITS;
+
+struct ProductTable {
+    keys: Vec<i32>,
+    ranks: Vec<i16>,
+}
+
+static PRODUCT_TABLE: OnceLock<ProductTable> = OnceLock::new();
+
+fn product_slot(product: i32) -> usize {
+    ((product as u32).wrapping_mul(0x9E3779B1) >> (32 - PRODUCT_TABLE_BITS)) as usize
+}
+
+fn product_table() -> &'static ProductTable {
+    PRODUCT_TABLE.get_or_init(|| {
+        let mut table = ProductTable { keys: vec![0; PRODUCT_TABLE_SIZE], ranks: vec![0; PRODUCT_TABLE_SIZE] };
+        for (product, rank) in tables::CARD_PRODUCTS.iter().zip(tables::PRODUCT_RANKS.iter()) {
+            let mut slot = product_slot(*product);
+            while table.keys[slot] != 0 {
+                slot = (slot + 1) & (PRODUCT_TABLE_SIZE - 1);
+            }
+            table.keys[slot] = *product;
+            table.ranks[slot] = *rank;
+        }
+        table
+    })
+}
+
+// Build the product table now rather than on the first showdown.
+pub fn init() {
+    product_table();
+}
+
+// What rank.rs needs from a group of cards: the OR of the rank bits, the AND of the suit bits and the product of the primes.
+#[derive(Clone, Copy)]
+struct Partial {
+    bits: c_long,
+    suits: c_long,
+    product: c_long,
+}
+
+fn partial2(a: c_long, b: c_long) -> Partial {
+    Partial { bits: a | b, suits: a & b & 0xF000, product: (a & 0xFF) * (b & 0xFF) }
+}
+
+fn partial3(a: c_long, b: c_long, c: c_long) -> Partial {
+    Partial { bits: a | b | c, suits: a & b & c & 0xF000, product: (a & 0xFF) * (b & 0xFF) * (c & 0xFF) }
+}
+
+// Same result as rank::rank on the five cards of the two partials.
+#[inline]
+fn combine(table: &ProductTable, hand: &Partial, board: &Partial) -> i32 {
+    let distinct_index = ((hand.bits | board.bits) >> 16) as usize;
+    if hand.suits & board.suits != 0 {
+        return tables::FLUSHES[distinct_index] as i32;
+    }
+    let unique = tables::UNIQUE5[distinct_index];
+    if unique != 0 {
+        return unique as i32;
+    }
+    let product = (hand.product * board.product) as i32;
+    let mut slot = product_slot(product);
+    loop {
+        let key = table.keys[slot];
+        if key == product {
+            return table.ranks[slot] as i32;
+        }
+        if key == 0 {
+            panic!("couldn't find {} in CARD_PRODUCTS", product);
+        }
+        slot = (slot + 1) & (PRODUCT_TABLE_SIZE - 1);
+    }
+}
+
+// Omaha best rank: the 10 board triples and 6 hand pairs are summarised once and reused across all 60 combinations.
+pub fn best_rank_w_board(hand: [c_long; 4], board: [c_long; 5]) -> i32 {
+    let table = product_table();
+    let mut triples = [Partial { bits: 0, suits: 0, product: 0 }; 10];
+    let mut ti = 0;
+    for i in 0..3 {
+        for j in (i + 1)..4 {
+            for k in (j + 1)..5 {
+                triples[ti] = partial3(board[i], board[j], board[k]);
+                ti += 1;
+            }
+        }
+    }
+    let mut cur_rank: i32 = 0xFFFF;
+    for i in 0..3 {
+        for j in (i + 1)..4 {
+            let pair = partial2(hand[i], hand[j]);
+            for triple in triples.iter() {
+                let new_rank = combine(table, &pair, triple);
+                if new_rank < cur_rank {
+                    cur_rank = new_rank;
+                }
+            }
+        }
+    }
+    cur_rank
+}
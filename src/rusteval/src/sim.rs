@@ -1,14 +1,48 @@
 extern crate libc;
-extern crate rand;
 
+use std::slice;
+use std::sync::atomic::{AtomicUsize, Ordering};
 use rank::rank;
-use self::libc::{c_long, c_float, c_int};
-use self::rand::distributions::{IndependentSample, Range};
+use lookup;
+use rng::Rng;
+use self::libc::{c_long, c_float, c_int, size_t};
+
+// Omaha evaluators. COMBOS ranks each of the 60 combinations with rank::rank,
+// LOOKUP reuses board triples and replaces the product binary search with a hash table.
+pub const EVALUATOR_COMBOS: c_int = 0;
+pub const EVALUATOR_LOOKUP: c_int = 1;
+
+static EVALUATOR: AtomicUsize = AtomicUsize::new(EVALUATOR_COMBOS as usize);
+
+// Select the Omaha evaluator. Returns the mode now in use, or -1 for an unknown mode.
+#[no_mangle]
+pub extern fn set_evaluator(mode: c_int) -> c_int {
+    match mode {
+        EVALUATOR_COMBOS => {},
+        EVALUATOR_LOOKUP => lookup::init(),
+        _ => return -1,
+    }
+    EVALUATOR.store(mode as usize, Ordering::Relaxed);
+    mode
+}
+
+#[no_mangle]
+pub extern fn get_evaluator() -> c_int {
+    EVALUATOR.load(Ordering::Relaxed) as c_int
+}
+
+pub fn omaha_rank(hand: [c_long; 4], board: [c_long; 5]) -> i32 {
+    if EVALUATOR.load(Ordering::Relaxed) == EVALUATOR_LOOKUP as usize {
+        lookup::best_rank_w_board(hand, board)
+    } else {
+        best_rank_w_board(hand, board)
+    }
+}
 
 #[no_mangle]
 pub extern fn winner(hand1: *const [c_long; 4], hand2: *const [c_long; 4], board: *const [c_long; 5]) -> c_int {
-    let rank1 = unsafe { best_rank_w_board(*hand1, *board) };
-    let rank2 = unsafe { best_rank_w_board(*hand2, *board) };
+    let rank1 = unsafe { omaha_rank(*hand1, *board) };
+    let rank2 = unsafe { omaha_rank(*hand2, *board) };
     if rank1 < rank2 {
         1
     } else if rank1 > rank2 {
@@ -26,7 +60,7 @@ pub extern fn hand_vs_hand(hand1: *const [c_long; 4], hand2: *const [c_long; 4],
 
 #[no_mangle]
 pub extern fn hand_with_board_rank(hand: *const [c_long; 4], board: *const [c_long; 5]) -> c_int {
-    unsafe { best_rank_w_board(*hand, *board) }
+    unsafe { omaha_rank(*hand, *board) }
 }
 
 #[no_mangle]
@@ -34,6 +68,29 @@ pub extern fn holdem_hand_with_board_rank(hand: *const [c_long; 2], board: *cons
     unsafe { holdem_best_rank_w_board(*hand, *board) }
 }
 
+// Ranks count hands against count boards in one call.
+// hands is a contiguous count x 4 array, boards count x 5, ranks receives count results.
+#[no_mangle]
+pub extern fn hand_with_board_rank_batch(hands: *const c_long, boards: *const c_long, ranks: *mut c_int, count: size_t) {
+    let hands = unsafe { slice::from_raw_parts(hands as *const [c_long; 4], count) };
+    let boards = unsafe { slice::from_raw_parts(boards as *const [c_long; 5], count) };
+    let ranks = unsafe { slice::from_raw_parts_mut(ranks, count) };
+    for i in 0..count {
+        ranks[i] = omaha_rank(hands[i], boards[i]);
+    }
+}
+
+// Holdem version of hand_with_board_rank_batch. hands is count x 2.
+#[no_mangle]
+pub extern fn holdem_hand_with_board_rank_batch(hands: *const c_long, boards: *const c_long, ranks: *mut c_int, count: size_t) {
+    let hands = unsafe { slice::from_raw_parts(hands as *const [c_long; 2], count) };
+    let boards = unsafe { slice::from_raw_parts(boards as *const [c_long; 5], count) };
+    let ranks = unsafe { slice::from_raw_parts_mut(ranks, count) };
+    for i in 0..count {
+        ranks[i] = holdem_best_rank_w_board(hands[i], boards[i]);
+    }
+}
+
 #[no_mangle]
 pub extern fn holdem_winner(hand1: *const [c_long; 2], hand2: *const [c_long; 2], board: *const [c_long; 5]) -> c_int {
     let rank1 = unsafe { holdem_best_rank_w_board(*hand1, *board) };
@@ -49,8 +106,9 @@ pub extern fn holdem_winner(hand1: *const [c_long; 2], hand2: *const [c_long; 2]
 
 fn run_hand_vs_hand(hand1: [c_long; 4], hand2: [c_long; 4], deck: &mut [c_long; 44], iterations: c_int) -> c_float {
     let mut wins = 0;
+    let mut rng = Rng::from_entropy();
     for _ in 0..iterations {
-        shuffle_5(deck);
+        shuffle_5(deck, &mut rng);
         let rank1 = best_rank(hand1, deck);
         let rank2 = best_rank(hand2, deck);
         if rank1 < rank2 {
@@ -60,7 +118,7 @@ fn run_hand_vs_hand(hand1: [c_long; 4], hand2: [c_long; 4], deck: &mut [c_long;
     wins as c_float / iterations as c_float
 }
 
-fn holdem_best_rank_w_board(hand: [c_long; 2], board: [c_long; 5]) -> i32 {
+pub fn holdem_best_rank_w_board(hand: [c_long; 2], board: [c_long; 5]) -> i32 {
     let mut cur_rank: i32 = 0xFFFF;
     for bi in 0..10 {
         let bc = [(0,1,2),(0,1,3),(0,1,4),(0,2,3),(0,2,4),(0,3,4),(1,2,3),(1,2,4),(1,3,4),(2,3,4)][bi];
@@ -101,28 +159,12 @@ fn best_rank_w_board(hand: [c_long; 4], board: [c_long; 5]) -> i32 {
 }
 
 fn best_rank(hand: [c_long; 4], deck: &mut [c_long; 44]) -> i32 {
-    let mut cur_rank: i32 = 0xFFFF;
-    for hi in 0..6 {
-        let hc = [(0,1),(0,2),(0,3),(1,2),(1,3),(2,3)][hi];
-        for bi in 0..10 {
-            let bc = [(0,1,2),(0,1,3),(0,1,4),(0,2,3),(0,2,4),(0,3,4),(1,2,3),(1,2,4),(1,3,4),(2,3,4)][bi];
-            let new_rank = rank(hand[hc.0], hand[hc.1], deck[bc.0], deck[bc.1], deck[bc.2]);
-            if new_rank < cur_rank {
-                cur_rank = new_rank;
-            }
-        }
-    }
-    cur_rank
+    omaha_rank(hand, [deck[0], deck[1], deck[2], deck[3], deck[4]])
 }
 
-fn shuffle_5(deck: &mut [c_long; 44]) {
-    let mut rng = rand::thread_rng();
-    let mut x: c_long;
-
+fn shuffle_5(deck: &mut [c_long; 44], rng: &mut Rng) {
     for start in 0..5 {
-        let i = Range::new(start, 44).ind_sample(&mut rng);
-        x = deck[start];
-        deck[start] = deck[i];
-        deck[i] = x;
+        let i = start + rng.below(44 - start);
+        deck.swap(start, i);
     }
 }